@@ -59,12 +59,36 @@ function App() {
   const API_BASE_URL = 'http://localhost:5000/api';
 
   useEffect(() => {
-    checkHealth();
-    fetchHistoricalData();
-    fetchMarketLinks();
-    fetchModelInfo();
+    fetchDashboard();
   }, []);
 
+  const fetchDashboard = async () => {
+    try {
+      // Health, historical data, forecast, model info and links in one request
+      const response = await fetch(`${API_BASE_URL}/dashboard?days=${predictionDays}`);
+      const data = await response.json();
+      if (data.status !== 'success') {
+        throw new Error(data.message);
+      }
+      setModelStatus('healthy');
+      setHistoricalData(data.historical.data);
+      setCurrentPrice(data.current_price);
+      setMarketLinks(data.links);
+      if (data.model_info.status === 'success') {
+        setModelInfo(data.model_info);
+      }
+      if (data.forecast) {
+        setPredictions(data.forecast.predictions);
+      }
+    } catch (error) {
+      console.error('Error fetching dashboard, falling back to individual requests:', error);
+      checkHealth();
+      fetchHistoricalData();
+      fetchMarketLinks();
+      fetchModelInfo();
+    }
+  };
+
   const checkHealth = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/health`);
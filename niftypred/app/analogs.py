@@ -0,0 +1,268 @@
+"""
+Historical analog search
+Indexes every normalized sequence_length window of the archive symbols (the
+windows the feature store already materializes, normalized relative to
+their first price like prepare_advanced_data()) and finds the past windows
+closest to a query window, together with what the price did next.
+
+Search is exact L2 nearest neighbours in two stages. Every window is also
+kept as its projection onto a few leading singular vectors plus the norm of
+the remainder, which gives a lower bound on its true distance to the query.
+The small projected matrix is scanned first (one matrix-vector product and
+an argpartition) and only the most promising windows are compared in full;
+the candidate set grows until no unseen window's bound can beat the
+results, so the answer matches a full scan at a fraction of the memory
+traffic.
+"""
+
+import threading
+
+import numpy as np
+
+from feature_store import normalized_windows
+
+
+class AnalogIndex:
+    """Growing matrix of normalized windows across many symbols
+
+    refresh() appends windows for bars added to the feature store since the
+    last call and rebuilds only if a symbol's stored history was replaced.
+    It returns at once while the price store serves the same series objects
+    as at the last refresh, so it is cheap to call before every search.
+    """
+
+    def __init__(self, feature_store, symbols, sequence_length=100, components=16):
+        self.feature_store = feature_store
+        self.symbols = symbols  # callable returning the symbols to index
+        self.sequence_length = sequence_length
+        self.components = components
+        self.closes = {}
+        self.dates = {}
+        self._sources = None  # price series indexed at the last refresh
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Fresh buffers, so searches holding the old ones keep a consistent view
+        self.vectors = np.empty((0, self.sequence_length), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self.owner = np.empty(0, dtype=np.int32)
+        self.position = np.empty(0, dtype=np.int32)
+        self.reduced = np.empty((0, self.components), dtype=np.float32)
+        self.reduced_norms = np.empty(0, dtype=np.float32)
+        self.residual = np.empty(0, dtype=np.float32)
+        self.basis = None
+        self.size = 0
+        self.names = []
+        self.indexed = {}
+        self.last_row = {}
+
+    def _reserve(self, extra):
+        """Grow the row buffers geometrically so appends are amortized O(1)"""
+        needed = self.size + extra
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors), 1024)
+        for name in ('vectors', 'norms', 'owner', 'position', 'reduced', 'reduced_norms', 'residual'):
+            old = getattr(self, name)
+            grown = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def _fit_basis(self, windows, sample=20000, seed=0):
+        """Leading right singular vectors of (a sample of) the windows
+
+        Any orthonormal basis keeps the distance bound valid; a good one
+        just makes it tighter.
+        """
+        if len(windows) > sample:
+            windows = windows[np.random.default_rng(seed).choice(len(windows), sample, replace=False)]
+        _, _, vt = np.linalg.svd(np.asarray(windows, dtype=float), full_matrices=False)
+        basis = np.zeros((self.sequence_length, self.components), dtype=np.float32)
+        basis[:, :min(self.components, len(vt))] = vt[:self.components].T
+        return basis
+
+    def _append(self, symbol, windows, first):
+        if symbol not in self.names:
+            self.names.append(symbol)
+        rows = len(windows)
+        self._reserve(rows)
+        block = slice(self.size, self.size + rows)
+        self.vectors[block] = windows[:, :self.sequence_length]
+        self.norms[block] = np.einsum('ij,ij->i', self.vectors[block], self.vectors[block])
+        self.reduced[block] = self.vectors[block] @ self.basis
+        self.reduced_norms[block] = np.einsum('ij,ij->i', self.reduced[block], self.reduced[block])
+        self.residual[block] = np.sqrt(np.maximum(self.norms[block] - self.reduced_norms[block], 0))
+        self.owner[block] = self.names.index(symbol)
+        self.position[block] = np.arange(first, first + rows)
+        self.size += rows
+        self.last_row[symbol] = self.size - 1
+
+    def _matches(self, symbol, features):
+        """Whether the already indexed windows of a symbol are still what the store holds"""
+        count = self.indexed.get(symbol, 0)
+        if count == 0:
+            return True
+        if len(features.windows) < count:
+            return False
+        return np.array_equal(self.vectors[self.last_row[symbol]],
+                              features.windows[count - 1, :self.sequence_length])
+
+    def _current_sources(self):
+        sources = {}
+        for symbol in self.symbols():
+            try:
+                sources[symbol] = self.feature_store.price_store.get(symbol)
+            except Exception:
+                sources[symbol] = None
+        return sources
+
+    def _unchanged_sources(self, sources):
+        return (self._sources is not None and sources.keys() == self._sources.keys()
+                and all(sources[symbol] is self._sources[symbol] for symbol in sources))
+
+    def _feature_sets(self, symbols):
+        sets = {}
+        for symbol in symbols:
+            try:
+                sets[symbol] = self.feature_store.update(symbol)
+            except Exception as e:
+                print(f"Skipping {symbol} for analogs: {e}")
+        return sets
+
+    def refresh(self):
+        """Index new windows of changed symbols; returns the number of windows added"""
+        sources = self._current_sources()
+        if self._unchanged_sources(sources):
+            return 0
+        # One refresh at a time; searches keep using the current buffers meanwhile
+        with self._refresh_lock:
+            if self._unchanged_sources(sources):
+                return 0
+            previous = self._sources or {}
+            changed = [symbol for symbol in sources if previous.get(symbol) is not sources[symbol] or symbol not in previous]
+            sets = self._feature_sets(changed)
+            rebuild = (self._sources is None or set(sources) != set(previous)
+                       or not all(self._matches(symbol, features) for symbol, features in sets.items()))
+            if rebuild:
+                # New symbols or some history was rebuilt: start the index over
+                sets.update(self._feature_sets([symbol for symbol in sources if symbol not in sets]))
+
+            # Copies of the new rows, so the index does not keep every old mapping alive
+            updates = {}
+            for symbol, features in sets.items():
+                count = 0 if rebuild else self.indexed.get(symbol, 0)
+                updates[symbol] = (np.array(features.column('Close'), dtype=float), np.array(features.dates),
+                                   np.array(features.windows[count:]), count)
+
+            if rebuild:
+                windows = [update[2][:, :self.sequence_length] for update in updates.values() if len(update[2])]
+                basis = self._fit_basis(np.concatenate(windows)) if windows else None
+
+            with self._lock:
+                if rebuild:
+                    self._reset()
+                    self.basis = basis
+                added = 0
+                for symbol, (closes, dates, windows, count) in updates.items():
+                    self.closes[symbol] = closes
+                    self.dates[symbol] = dates
+                    if len(windows):
+                        self._append(symbol, windows, count)
+                        added += len(windows)
+                        self.indexed[symbol] = count + len(windows)
+            self._sources = sources
+            return added
+
+    def query_vector(self, closes):
+        """Normalize the last sequence_length closes the way the index is normalized"""
+        closes = np.asarray(closes, dtype=float)
+        if len(closes) < self.sequence_length:
+            raise ValueError(f"Need at least {self.sequence_length} prices for an analog query")
+        return normalized_windows(closes[-self.sequence_length:], self.sequence_length)[0]
+
+    def search(self, closes, k=10, horizon=20, min_gap=None, exclude=None):
+        """The k past windows closest to the latest window of closes
+
+        Only windows with at least `horizon` later bars are considered, and
+        matches from the same symbol must start min_gap bars apart (default
+        sequence_length // 2) so overlapping near-copies don't crowd the
+        result. exclude=(symbol, date) skips that symbol's windows whose
+        forward path reaches the date, e.g. the query's own history.
+
+        Returns a list of dicts with symbol, start/end dates, distance and
+        the forward path as returns relative to the window's last close.
+        """
+        query = self.query_vector(closes)
+        min_gap = self.sequence_length // 2 if min_gap is None else min_gap
+        with self._lock:
+            size, basis = self.size, self.basis
+            vectors, norms, owner, position = self.vectors, self.norms, self.owner, self.position
+            reduced, reduced_norms, residual = self.reduced, self.reduced_norms, self.residual
+            names, all_closes, all_dates = list(self.names), dict(self.closes), dict(self.dates)
+        if size == 0:
+            raise LookupError('The analog index is empty')
+        owner, position = owner[:size], position[:size]
+
+        # Windows need `horizon` bars after their last bar
+        lengths = np.array([len(all_closes[name]) for name in names])
+        invalid = position + self.sequence_length + horizon > lengths[owner]
+        if exclude is not None and exclude[0] in names:
+            symbol_id = names.index(exclude[0])
+            cutoff = int(np.searchsorted(all_dates[exclude[0]], np.datetime64(exclude[1], 'D')))
+            invalid |= (owner == symbol_id) & (position + self.sequence_length + horizon > cutoff)
+
+        # Lower bound: ||P(w - q)||^2 + (||R w|| - ||R q||)^2 <= ||w - q||^2
+        query_reduced = query @ basis
+        query_norm = float(np.dot(query, query))
+        query_residual = np.sqrt(max(query_norm - float(np.dot(query_reduced, query_reduced)), 0.0))
+        bound = reduced_norms[:size] - 2 * (reduced[:size] @ query_reduced) + np.dot(query_reduced, query_reduced)
+        bound += np.square(residual[:size] - query_residual)
+        bound[invalid] = np.inf
+
+        # Enough exact candidates to pick k non-overlapping matches from
+        valid = size - int(invalid.sum())
+        wanted = min(valid, k * 20)
+        if wanted == 0:
+            return []
+        count = min(valid, max(4 * wanted, 256))
+        while True:
+            if count < size:
+                order = np.argpartition(bound, count)
+                candidates, next_bound = order[:count], bound[order[count]]
+            else:
+                candidates, next_bound = np.arange(size), np.inf
+            exact = norms[candidates] - 2 * (vectors[candidates] @ query) + query_norm
+            exact[invalid[candidates]] = np.inf
+            # Done once the wanted-th best exact distance beats every unseen bound
+            if count >= valid or np.partition(exact, wanted - 1)[wanted - 1] <= next_bound * (1 - 1e-5):
+                break
+            count = min(valid, count * 4)
+
+        ranked = np.argsort(exact)
+        matches = []
+        chosen = {}
+        for row, distance in zip(candidates[ranked], exact[ranked]):
+            if len(matches) == k or not np.isfinite(distance):
+                break
+            symbol_id, start = int(owner[row]), int(position[row])
+            if any(abs(start - other) < min_gap for other in chosen.get(symbol_id, [])):
+                continue
+            chosen.setdefault(symbol_id, []).append(start)
+
+            symbol = names[symbol_id]
+            series = all_closes[symbol]
+            last = start + self.sequence_length - 1
+            matches.append({
+                'symbol': symbol,
+                'start_date': str(all_dates[symbol][start]),
+                'end_date': str(all_dates[symbol][last]),
+                'distance': float(np.sqrt(max(distance, 0.0))),
+                'forward': series[last + 1:last + 1 + horizon] / series[last] - 1
+            })
+        return matches
+
+    def stats(self):
+        return {'windows': int(self.size), 'symbols': len(self.names),
+                'bytes': int(self.size * self.sequence_length * 4)}
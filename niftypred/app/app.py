@@ -1,9 +1,11 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
 import os
+import hashlib
+import threading
 from datetime import datetime, timedelta
 import yfinance as yf
 import requests
@@ -18,6 +20,19 @@ from tensorflow.keras.metrics import RootMeanSquaredError
 import warnings
 warnings.filterwarnings('ignore')
 
+from streaming import BarBroadcaster, source_from_env
+from price_store import PriceStore, normalize_interval, normalize_symbol
+from correlation import CorrelationService
+from feature_store import FeatureStore, FEATURES_DIR
+from training_data import WindowStream
+from snapshots import SnapshotStore, PrecomputeScheduler, SNAPSHOT_PATH
+from indicators import evaluate as evaluate_indicators, parse_indicator_names, required_lookback
+from single_flight import SingleFlight
+import columnar
+import scenarios
+from sector_indices import IndexEngine, INDICES_DIR
+from analogs import AnalogIndex
+
 app = Flask(__name__)
 CORS(app)
 
@@ -26,70 +41,48 @@ model = None
 scaler = None
 sequence_length = 100  # Changed to match notebook
 model_performance = {}
+global_model = None
+global_model_performance = {}
+bar_broadcaster = None
+
+# Concurrent identical data fetches and training runs share one execution
+single_flight = SingleFlight()
+
+# Everything the app writes (models, snapshots, features, indices) goes under
+# NIFTY_STATE_DIR when set, e.g. to keep a load-test backend off the real files
+state_dir = os.environ.get('NIFTY_STATE_DIR')
+
+def state_path(name, default):
+    return os.path.join(state_dir, name) if state_dir else default
+
+model_dir = state_path('saved_model', os.path.join(os.path.dirname(__file__), '..', 'saved_model'))
+
+# Indexed price histories; NIFTY is fetched over a long window and refreshed periodically
+price_store = PriceStore()
+nifty_history_years = int(os.environ.get('NIFTY_HISTORY_YEARS', '20'))
 
 def calculate_technical_indicators(data):
-    """Calculate various technical indicators based on notebook approach"""
-    indicators = {}
+    """Calculate various technical indicators based on notebook approach
     
-    if 'Close' in data.columns:
-        close = data['Close']
-        high = data['High'] if 'High' in data.columns else close
-        low = data['Low'] if 'Low' in data.columns else close
-        volume = data['Volume'] if 'Volume' in data.columns else None
-        
-        # Moving averages (from notebook)
-        ma_days = [10, 50, 100]
-        for ma in ma_days:
-            column_name = f"MA_{ma}_days"
-            indicators[column_name] = close.rolling(window=ma).mean().tolist()
-        
-        # Enhanced moving averages
-        indicators['SMA_20'] = close.rolling(window=20).mean().tolist()
-        indicators['SMA_50'] = close.rolling(window=50).mean().tolist()
-        indicators['EMA_12'] = close.ewm(span=12).mean().tolist()
-        indicators['EMA_26'] = close.ewm(span=26).mean().tolist()
-        
-        # MACD
-        ema12 = close.ewm(span=12).mean()
-        ema26 = close.ewm(span=26).mean()
-        indicators['MACD'] = (ema12 - ema26).tolist()
-        indicators['MACD_Signal'] = (ema12 - ema26).ewm(span=9).mean().tolist()
-        indicators['MACD_Histogram'] = ((ema12 - ema26) - (ema12 - ema26).ewm(span=9).mean()).tolist()
-        
-        # RSI
-        delta = close.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        indicators['RSI'] = (100 - (100 / (1 + rs))).tolist()
-        
-        # Bollinger Bands
-        sma20 = close.rolling(window=20).mean()
-        std20 = close.rolling(window=20).std()
-        indicators['BB_Upper'] = (sma20 + (std20 * 2)).tolist()
-        indicators['BB_Lower'] = (sma20 - (std20 * 2)).tolist()
-        indicators['BB_Middle'] = sma20.tolist()
-        indicators['BB_Width'] = ((sma20 + (std20 * 2)) - (sma20 - (std20 * 2))).tolist()
-        
-        # Volume indicators
-        if volume is not None:
-            indicators['Volume_SMA'] = volume.rolling(window=20).mean().tolist()
-            indicators['Volume'] = volume.tolist()
-            indicators['Volume_Ratio'] = (volume / volume.rolling(window=20).mean()).tolist()
-        
-        # Price change percentages (from notebook)
-        indicators['Daily_Return'] = close.pct_change().tolist()
-        indicators['Cumulative_Return'] = ((close / close.iloc[0]) - 1).tolist()
-        
-        # Additional indicators from notebook
-        indicators['Price_Change'] = close.diff().tolist()
-        indicators['Price_Change_Pct'] = (close.diff() / close.shift(1) * 100).tolist()
-        
-        # Volatility indicators
-        indicators['Volatility_20'] = close.rolling(window=20).std().tolist()
-        indicators['Volatility_50'] = close.rolling(window=50).std().tolist()
-        
-    return indicators
+    Evaluates every indicator over the whole frame; see indicators.py for
+    evaluating a subset over part of it.
+    """
+    return {name: values.tolist() for name, values in evaluate_indicators(data).items()}
+
+# Volume columns, which run past float32's 24-bit mantissa and keep full precision in binary responses
+volume_columns = ('volume', 'Volume', 'Volume_SMA')
+
+# Limits for /api/predict and /api/predict/batch
+max_batch_items = 500
+max_batch_days = 365
+
+# Limits for /api/scenarios
+max_scenario_paths = 200000
+max_scenario_days = 750
+
+# Limits for /api/analogs
+max_analog_matches = 100
+max_analog_horizon = 250
 
 def create_advanced_cnn_lstm_model(input_shape):
     """Create advanced CNN-LSTM model based on notebook architecture"""
@@ -154,12 +147,39 @@ def prepare_advanced_data(data, sequence_length):
     
     return np.array(X), np.array(y)
 
-def fetch_nifty_data():
-    """Fetch latest NIFTY data using yfinance"""
+def generate_synthetic_data(days=365, seed=42):
+    """Generate a deterministic NIFTY-like OHLCV series (used for load testing)"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(datetime.now().date())
+    dates = pd.bdate_range(end=end - timedelta(days=1), periods=int(days * 252 / 365))
+    returns = rng.normal(0.0004, 0.01, len(dates))
+    close = 18000 * np.exp(np.cumsum(returns))
+    open_ = close * np.exp(rng.normal(0, 0.003, len(dates)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, len(dates))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, len(dates))))
+    volume = rng.integers(150000, 450000, len(dates)).astype(float)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=pd.DatetimeIndex(dates, name='Date'))
+
+def fetch_nifty_data(start=None, end=None):
+    """Fetch NIFTY data using yfinance (the trailing year unless start/end are given)
+    
+    Concurrent calls for the same dates share one download and get the same
+    DataFrame back, so callers must not modify it.
+    """
+    start = pd.to_datetime(start) if start is not None else datetime.now() - timedelta(days=365)
+    end = pd.to_datetime(end) if end is not None else datetime.now()
+    key = ('fetch_nifty_data', start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    return single_flight.do(key, _fetch_nifty_data, start, end)
+
+def _fetch_nifty_data(start, end):
     try:
+        # Stubbed data source for load tests and offline development
+        if os.environ.get('NIFTY_DATA_SOURCE') == 'synthetic':
+            return generate_synthetic_data(days=max((datetime.now() - start).days, 1))
+        
         # Fetch NIFTY 50 data
-        nifty = yf.download('^NSEI', start=(datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d'), 
-                           end=datetime.now().strftime('%Y-%m-%d'))
+        nifty = yf.download('^NSEI', start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'))
         
         if not nifty.empty:
             # Fix multi-index column names from yfinance
@@ -174,7 +194,7 @@ def fetch_nifty_data():
             nifty = pd.read_csv(csv_path)
             nifty['Date'] = pd.to_datetime(nifty['Date'])
             nifty = nifty.set_index('Date')
-            nifty = nifty.sort_index()
+            nifty = nifty.sort_index().loc[start:end]
             print(f"Using CSV fallback data: {nifty.shape}, columns: {nifty.columns.tolist()}")
             return nifty
         
@@ -184,33 +204,94 @@ def fetch_nifty_data():
         print(f"Error fetching data: {e}")
         return None
 
+price_store.add_loader(
+    'NIFTY',
+    lambda: fetch_nifty_data(start=datetime.now() - timedelta(days=365 * nifty_history_years)),
+    ttl=int(os.environ.get('PRICE_CACHE_SECONDS', '900'))
+)
+
+# Sector (stock_metadata.csv industries) and basket indices, served like any other symbol
+index_engine = IndexEngine(price_store, root=state_path('indices', INDICES_DIR),
+                           weighting=os.environ.get('SECTOR_INDEX_WEIGHTING', 'turnover'))
+index_engine.register(ttl=int(os.environ.get('PRICE_CACHE_SECONDS', '900')))
+
+# Rolling correlations between NIFTY, the archive constituents and global indices
+correlation_service = CorrelationService(price_store)
+
+# Indicator columns and normalized windows, materialized once per symbol and appended as bars arrive
+feature_store = FeatureStore(price_store, calculate_technical_indicators, root=state_path('features', FEATURES_DIR))
+
+# Normalized windows of every archive symbol for nearest-neighbour analog search
+analog_index = AnalogIndex(feature_store, price_store.archive_symbols, sequence_length)
+
+def stored_indicators(symbol, data, offset=0):
+    """Indicator columns for data from the feature store, matched by date
+    
+    Cumulative_Return is measured from row `offset`, the first returned bar.
+    """
+    try:
+        features = feature_store.update(symbol)
+        # Match by date rather than series position, in case the stored rows start elsewhere
+        first = int(np.searchsorted(features.dates, data.index[0].to_datetime64().astype('datetime64[D]')))
+        last = first + len(data)
+        if last > features.rows or not np.array_equal(features.dates[first:last],
+                                                       data.index.to_numpy().astype('datetime64[D]')):
+            return None
+        indicators = {name: np.array(features.column(name, first, last))
+                      for name in features.columns if name != 'Close'}
+        close = data['Close']
+        cumulative = np.full(len(close), np.nan)
+        cumulative[offset:] = close.to_numpy()[offset:] / close.iloc[offset] - 1
+        indicators['Cumulative_Return'] = cumulative
+        return indicators
+    except Exception as e:
+        print(f"Feature store unavailable for {symbol}: {e}")
+        return None
+
 def train_model():
-    """Train the advanced CNN-LSTM model"""
-    global model, scaler, model_performance
+    """Train the advanced CNN-LSTM model
     
-    # Fetch data
-    data = fetch_nifty_data()
-    if data is None:
-        return False
+    Requests arriving while a training run is going wait for that run and
+    share its result instead of starting a second one.
+    """
+    return single_flight.do(('train_model',), _train_model)
+
+def _train_model():
+    global model, scaler, model_performance
     
-    # Use Close prices
-    if 'Close' in data.columns:
-        prices = data['Close'].values.reshape(-1, 1)
-    else:
-        # If no Close column, use the last numeric column
-        numeric_cols = data.select_dtypes(include=[np.number]).columns
-        if len(numeric_cols) > 0:
-            prices = data[numeric_cols[-1]].values.reshape(-1, 1)
-        else:
+    start = datetime.now() - timedelta(days=365)
+    try:
+        # Windows of the trailing year, read from the feature store
+        features = feature_store.update('NIFTY')
+        series = price_store.get('NIFTY')
+        prices = series.columns['Close'][series.locate(start)[0]:].reshape(-1, 1)
+        X, y = features.training_arrays(start=start, sequence_length=sequence_length)
+    except Exception as e:
+        print(f"Feature store unavailable, preparing windows directly: {e}")
+        
+        # Fetch data
+        data = fetch_nifty_data()
+        if data is None:
             return False
+        
+        # Use Close prices
+        if 'Close' in data.columns:
+            prices = data['Close'].values.reshape(-1, 1)
+        else:
+            # If no Close column, use the last numeric column
+            numeric_cols = data.select_dtypes(include=[np.number]).columns
+            if len(numeric_cols) > 0:
+                prices = data[numeric_cols[-1]].values.reshape(-1, 1)
+            else:
+                return False
+        
+        # Prepare sequences using advanced method
+        X, y = prepare_advanced_data(data, sequence_length)
     
     # Scale the data
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled_data = scaler.fit_transform(prices)
     
-    # Prepare sequences using advanced method
-    X, y = prepare_advanced_data(data, sequence_length)
-    
     if len(X) == 0:
         return False
     
@@ -259,9 +340,9 @@ def train_model():
     }
     
     # Save model
-    model_path = os.path.join(os.path.dirname(__file__), '..', 'saved_model', 'nifty_model.h5')
-    scaler_path = os.path.join(os.path.dirname(__file__), '..', 'saved_model', 'scaler.pkl')
-    performance_path = os.path.join(os.path.dirname(__file__), '..', 'saved_model', 'performance.pkl')
+    model_path = os.path.join(model_dir, 'nifty_model.h5')
+    scaler_path = os.path.join(model_dir, 'scaler.pkl')
+    performance_path = os.path.join(model_dir, 'performance.pkl')
     
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
     model.save(model_path)
@@ -275,9 +356,9 @@ def load_model_from_disk():
     global model, scaler, model_performance
     
     try:
-        model_path = os.path.join(os.path.dirname(__file__), '..', 'saved_model', 'nifty_model.h5')
-        scaler_path = os.path.join(os.path.dirname(__file__), '..', 'saved_model', 'scaler.pkl')
-        performance_path = os.path.join(os.path.dirname(__file__), '..', 'saved_model', 'performance.pkl')
+        model_path = os.path.join(model_dir, 'nifty_model.h5')
+        scaler_path = os.path.join(model_dir, 'scaler.pkl')
+        performance_path = os.path.join(model_dir, 'performance.pkl')
         
         if os.path.exists(model_path) and os.path.exists(scaler_path):
             model = load_model(model_path)
@@ -292,34 +373,384 @@ def load_model_from_disk():
     
     return False
 
+def train_global_model(symbols=None, epochs=10, batch_size=64, buffer_size=8192, chunk_size=256):
+    """Train one CNN-LSTM on the normalized windows of many symbols
+    
+    Windows are streamed lazily from the feature store and shuffled across
+    symbols through a bounded buffer, so memory use doesn't grow with history.
+    Concurrent requests with the same options share one training run.
+    """
+    key = ('train_global_model', tuple(symbols) if symbols else None, epochs, batch_size, buffer_size, chunk_size)
+    return single_flight.do(key, _train_global_model, symbols, epochs, batch_size, buffer_size, chunk_size)
+
+def _train_global_model(symbols, epochs, batch_size, buffer_size, chunk_size):
+    global global_model, global_model_performance
+    
+    symbols = symbols or price_store.archive_symbols()
+    feature_sets = {}
+    for symbol in symbols:
+        try:
+            feature_sets[symbol] = feature_store.update(symbol)
+        except Exception as e:
+            print(f"Skipping {symbol}: {e}")
+    if not feature_sets:
+        return False
+    
+    stream_args = dict(batch_size=batch_size, buffer_size=buffer_size, chunk_size=chunk_size)
+    train_stream = WindowStream(feature_sets, sequence_length, split='train', **stream_args)
+    validation_stream = WindowStream(feature_sets, sequence_length, split='validation', **stream_args)
+    if len(train_stream) == 0 or len(validation_stream) == 0:
+        return False
+    
+    signature = (
+        tf.TensorSpec(shape=(None, 1, sequence_length, 1), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, 1), dtype=tf.float32)
+    )
+    train_data = tf.data.Dataset.from_generator(train_stream, output_signature=signature).prefetch(2)
+    validation_data = tf.data.Dataset.from_generator(validation_stream, output_signature=signature).prefetch(2)
+    
+    global_model = create_advanced_cnn_lstm_model((sequence_length, 1))
+    history = global_model.fit(train_data, epochs=epochs, validation_data=validation_data, verbose=0)
+    
+    global_model_performance = {
+        'symbols': sorted(feature_sets),
+        'training_windows': len(train_stream),
+        'validation_windows': len(validation_stream),
+        'training_loss': float(history.history['loss'][-1]),
+        'validation_loss': float(history.history['val_loss'][-1]),
+        'training_mae': float(history.history['mae'][-1]),
+        'validation_mae': float(history.history['val_mae'][-1]),
+        'training_epochs': len(history.history['loss'])
+    }
+    
+    model_path = os.path.join(model_dir, 'global_model.h5')
+    performance_path = os.path.join(model_dir, 'global_performance.pkl')
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    global_model.save(model_path)
+    joblib.dump(global_model_performance, performance_path)
+    
+    return True
+
+def load_global_model_from_disk():
+    """Load the pre-trained global model from disk"""
+    global global_model, global_model_performance
+    
+    try:
+        model_path = os.path.join(model_dir, 'global_model.h5')
+        performance_path = os.path.join(model_dir, 'global_performance.pkl')
+        
+        if os.path.exists(model_path):
+            global_model = load_model(model_path)
+            if os.path.exists(performance_path):
+                global_model_performance = joblib.load(performance_path)
+            return True
+    except Exception as e:
+        print(f"Error loading global model: {e}")
+    
+    return False
+
+def check_forecast_history(kind, prices):
+    """Raise ValueError if a price history cannot be forecast"""
+    prices = np.asarray(prices, dtype=float).reshape(-1)
+    if len(prices) < sequence_length:
+        raise ValueError(f'At least {sequence_length} prices are needed to forecast')
+    window = prices[-sequence_length:]
+    if not np.isfinite(window).all():
+        raise ValueError(f'The last {sequence_length} prices contain missing values')
+    if kind == 'global' and window[0] <= 0:
+        raise ValueError('The global model needs a positive first price in the window')
+
+def forecast_batch(kind, histories, days):
+    """Recursive forecasts for many price histories at once
+    
+    kind is 'nifty' (MinMax-scaled inputs, NIFTY model) or 'global' (inputs
+    relative to each window's first price, global model). Every horizon step
+    is one batched forward pass over the histories that still need values.
+    """
+    forecaster = model if kind == 'nifty' else global_model
+    days = np.asarray(days, dtype=int)
+    horizon = int(days.max())
+    
+    # Each row holds the last sequence_length inputs followed by the forecast values
+    paths = np.empty((len(histories), sequence_length + horizon))
+    for i, prices in enumerate(histories):
+        prices = np.asarray(prices, dtype=float).reshape(-1)
+        check_forecast_history(kind, prices)
+        window = prices[-sequence_length:]
+        paths[i, :sequence_length] = scaler.transform(window.reshape(-1, 1))[:, 0] if kind == 'nifty' else window
+    
+    for step in range(horizon):
+        active = np.flatnonzero(days > step)
+        windows = paths[active, step:step + sequence_length]
+        if kind == 'nifty':
+            inputs = windows
+        else:
+            first = windows[:, :1]
+            inputs = (windows - first) / first
+        
+        outputs = np.asarray(forecaster.predict_on_batch(inputs.reshape(-1, 1, sequence_length, 1))).reshape(-1)
+        paths[active, sequence_length + step] = outputs if kind == 'nifty' else first[:, 0] * (1 + outputs)
+    
+    forecasts = paths[:, sequence_length:]
+    if kind == 'nifty':
+        # Inverse transform predictions
+        forecasts = scaler.inverse_transform(forecasts.reshape(-1, 1)).reshape(forecasts.shape)
+    return [forecasts[i, :count] for i, count in enumerate(days)]
+
+def forecast_with_global_model(prices, days):
+    """Recursively forecast prices with the global model (inputs relative to the window's first price)"""
+    return forecast_batch('global', [prices], [days])[0]
+
+def forecast_prices(prices, days):
+    """Recursively forecast the next `days` prices from a price history"""
+    return forecast_batch('nifty', [prices], [days])[0]
+
+def format_predictions(last_date, predictions):
+    """Attach calendar dates to forecast values"""
+    results = []
+    for i, pred in enumerate(predictions):
+        results.append({
+            'date': (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d'),
+            'predicted_price': float(pred),
+            'day': i + 1
+        })
+    return results
+
+def stream_forecast(closes, last_date, days):
+    """Forecast callback used by the bar stream producer"""
+    if model is None and not load_model_from_disk():
+        raise RuntimeError('Model not available')
+    return format_predictions(pd.to_datetime(last_date), forecast_prices(closes, days))
+
+def get_bar_broadcaster():
+    """Create the shared bar stream producer on first use"""
+    global bar_broadcaster
+    if bar_broadcaster is None:
+        bar_broadcaster = BarBroadcaster(
+            lambda: source_from_env(fetch_nifty_data),
+            forecaster=stream_forecast,
+            forecast_days=int(os.environ.get('STREAM_FORECAST_DAYS', '0'))
+        )
+    return bar_broadcaster
+
+def model_stamp():
+    """Version of the saved models, used to invalidate snapshots after retraining"""
+    stamp = []
+    for name in ('nifty_model.h5', 'global_model.h5'):
+        path = os.path.join(model_dir, name)
+        stamp.append(os.path.getmtime(path) if os.path.exists(path) else None)
+    return tuple(stamp)
+
+def build_snapshot_entries():
+    """Precompute the forecast, historical and model-info payloads for every configured symbol"""
+    entries = {}
+    for symbol in precompute_symbols:
+        try:
+            payload, status = build_prediction_payload(symbol, precompute_max_days)
+            if status == 200:
+                entries[('predict', symbol)] = payload
+            payload, status = build_historical_payload(symbol)
+            if status == 200:
+                entries[('historical', symbol)] = payload
+        except Exception as e:
+            print(f"Precompute failed for {symbol}: {e}")
+    
+    payload, status = build_model_info_payload()
+    if payload.get('status') == 'success':
+        entries[('model-info',)] = payload
+    return entries
+
+def snapshot_response(key, transform=None):
+    """Serve a payload from the current snapshot, or None on a miss
+    
+    `transform` may adapt the stored payload to the request (returning None
+    turns the hit into a miss).
+    """
+    hit = snapshot_store.lookup(key, model_stamp())
+    if hit is None:
+        return None
+    snapshot, payload, body = hit
+    if transform is not None:
+        adapted = transform(payload)
+        if adapted is None:
+            return None
+        if adapted is not payload:
+            body = app.json.dumps(adapted)
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['X-Snapshot-Id'] = snapshot.id
+    return response
+
+# End-of-day precompute: payloads only change once per trading day
+precompute_symbols = [normalize_symbol(symbol) for symbol in os.environ.get('PRECOMPUTE_SYMBOLS', 'NIFTY').split(',') if symbol.strip()]
+precompute_max_days = int(os.environ.get('PRECOMPUTE_MAX_DAYS', '30'))
+snapshot_store = SnapshotStore(path=state_path(os.path.join('snapshots', 'current.pkl'), SNAPSHOT_PATH),
+                               max_age=float(os.environ.get('PRECOMPUTE_MAX_AGE_HOURS', '30')) * 3600)
+snapshot_store.load()
+precompute_scheduler = PrecomputeScheduler(
+    build_snapshot_entries,
+    snapshot_store,
+    model_stamp,
+    run_at=os.environ.get('PRECOMPUTE_AT', '16:00'),
+    timezone=os.environ.get('PRECOMPUTE_TIMEZONE', 'Asia/Kolkata'),
+    encode=lambda payload: app.json.dumps(payload)
+)
+
+# External market links shown on the dashboard
+market_links = [
+    {
+        'name': 'NSE India',
+        'url': 'https://www.nseindia.com/',
+        'description': 'Official National Stock Exchange website'
+    },
+    {
+        'name': 'Money Control',
+        'url': 'https://www.moneycontrol.com/india/stockpricequote/',
+        'description': 'Comprehensive stock market information'
+    },
+    {
+        'name': 'Yahoo Finance',
+        'url': 'https://finance.yahoo.com/quote/%5ENSEI/',
+        'description': 'NIFTY 50 on Yahoo Finance'
+    },
+    {
+        'name': 'Trading View',
+        'url': 'https://www.tradingview.com/symbols/NSE-NIFTY/',
+        'description': 'Advanced charting and analysis'
+    },
+    {
+        'name': 'Investing.com',
+        'url': 'https://in.investing.com/indices/s-p-cnx-nifty',
+        'description': 'Real-time NIFTY data and news'
+    }
+]
+
+# Encoded /api/dashboard bodies per forecast horizon: (version, body)
+dashboard_cache = {}
+dashboard_cache_lock = threading.Lock()
+
+def dashboard_version():
+    """Version of everything the dashboard shows: the NIFTY bars and the saved models"""
+    series = price_store.get('NIFTY')
+    return (len(series), str(series.dates[-1]), float(series.columns['Close'][-1])) + model_stamp()
+
+def build_dashboard_payload(days):
+    """Payload for /api/dashboard
+    
+    The historical rows and the forecast are both taken from the same NIFTY
+    series in the price store, so building it fetches the data once.
+    """
+    historical, status = build_historical_payload('NIFTY')
+    if status != 200:
+        return historical, status
+    
+    series = price_store.get('NIFTY')
+    last_date = pd.Timestamp(series.dates[-1])
+    forecast = None
+    if model is not None or load_model_from_disk():
+        forecast = {
+            'days': days,
+            'predictions': format_predictions(last_date, forecast_prices(series.columns['Close'], days))
+        }
+    model_info, _ = build_model_info_payload()
+    
+    return {
+        'status': 'success',
+        'health': {'status': 'healthy', 'message': 'NIFTY Prediction API is running'},
+        'current_price': float(series.columns['Close'][-1]),
+        'last_date': last_date.strftime('%Y-%m-%d'),
+        'historical': historical,
+        'forecast': forecast,
+        'model_info': model_info,
+        'links': market_links
+    }, 200
+
+def dashboard_body(days):
+    """Encoded dashboard for the current data and models, built once per version
+    
+    Returns (version, body, status, cache hit). Only successful payloads
+    are cached.
+    """
+    version = dashboard_version()
+    with dashboard_cache_lock:
+        cached = dashboard_cache.get(days)
+    if cached is not None and cached[0] == version:
+        return version, cached[1], 200, True
+    
+    def build():
+        payload, status = build_dashboard_payload(days)
+        body = app.json.dumps(payload)
+        if status == 200:
+            with dashboard_cache_lock:
+                dashboard_cache[days] = (version, body)
+        return body, status
+    # Concurrent misses for the same version share one build
+    body, status = single_flight.do(('dashboard', days, version), build)
+    return version, body, status, False
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """Everything the dashboard shows on load in one response
+    
+    Historical NIFTY bars with indicators, the current forecast (days query
+    parameter, default 7), model info and market links. Cached until the
+    NIFTY data or the saved models change.
+    """
+    try:
+        days = int(request.args.get('days', 7))
+        if not 1 <= days <= 30:
+            return jsonify({'status': 'error', 'message': 'days must be between 1 and 30'}), 400
+        
+        version, body, status, hit = dashboard_body(days)
+        if status != 200:
+            return app.response_class(body, status=status, mimetype='application/json')
+        response = app.response_class(body, mimetype='application/json')
+        response.headers['X-Dashboard-Cache'] = 'hit' if hit else 'miss'
+        response.set_etag(hashlib.sha1(repr((days, version)).encode()).hexdigest())
+        return response.make_conditional(request)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'message': 'NIFTY Prediction API is running'})
 
+def build_model_info_payload():
+    """Payload for /api/model-info"""
+    if model is None:
+        if not load_model_from_disk():
+            return {
+                'status': 'error',
+                'message': 'No model available',
+                'model_loaded': False
+            }, 200
+    
+    model_summary = []
+    if model:
+        model.summary(print_fn=lambda x: model_summary.append(x))
+    
+    return {
+        'status': 'success',
+        'model_loaded': model is not None,
+        'model_summary': model_summary,
+        'sequence_length': sequence_length,
+        'performance': model_performance if model_performance else None
+    }, 200
+
 @app.route('/api/model-info', methods=['GET'])
 def get_model_info():
     """Get information about the current model"""
     try:
-        if model is None:
-            if not load_model_from_disk():
-                return jsonify({
-                    'status': 'error',
-                    'message': 'No model available',
-                    'model_loaded': False
-                })
+        cached = snapshot_response(('model-info',))
+        if cached is not None:
+            return cached
         
-        model_summary = []
-        if model:
-            model.summary(print_fn=lambda x: model_summary.append(x))
-        
-        return jsonify({
-            'status': 'success',
-            'model_loaded': model is not None,
-            'model_summary': model_summary,
-            'sequence_length': sequence_length,
-            'performance': model_performance if model_performance else None
-        })
+        payload, status = build_model_info_payload()
+        return jsonify(payload), status
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -329,6 +760,8 @@ def train():
     try:
         success = train_model()
         if success:
+            # Refresh the precomputed payloads for the new model
+            precompute_scheduler.trigger()
             return jsonify({
                 'status': 'success', 
                 'message': 'Model trained successfully',
@@ -339,77 +772,281 @@ def train():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/train/global', methods=['POST'])
+def train_global():
+    """Train the global model on all (or the given) archive symbols"""
+    try:
+        options = request.get_json(silent=True) or {}
+        symbols = options.get('symbols')
+        success = train_global_model(
+            symbols=[normalize_symbol(symbol) for symbol in symbols] if symbols else None,
+            epochs=int(options.get('epochs', 10)),
+            batch_size=int(options.get('batch_size', 64)),
+            buffer_size=int(options.get('buffer_size', 8192)),
+            chunk_size=int(options.get('chunk_size', 256))
+        )
+        if success:
+            precompute_scheduler.trigger()
+            return jsonify({
+                'status': 'success',
+                'message': 'Global model trained successfully',
+                'performance': global_model_performance
+            })
+        else:
+            return jsonify({'status': 'error', 'message': 'Failed to train global model'}), 500
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def prediction_inputs(symbol):
+    """Close prices and last date used to forecast a symbol"""
+    if symbol == 'NIFTY':
+        recent_data = fetch_nifty_data()
+        if recent_data is None or 'Close' not in recent_data.columns:
+            raise RuntimeError('Failed to fetch data')
+        return recent_data['Close'].values, pd.to_datetime(recent_data.index[-1])
+    series = price_store.get(symbol)
+    if len(series.dates) == 0:
+        raise LookupError(f"No price history for {symbol}")
+    return series.columns['Close'], pd.Timestamp(series.dates[-1])
+
+def build_prediction_payload(symbol, days):
+    """Payload for /api/predict
+    
+    NIFTY uses the NIFTY model; any other symbol uses the global model.
+    """
+    if symbol != 'NIFTY':
+        if global_model is None and not load_global_model_from_disk():
+            return {'status': 'error', 'message': 'Global model not available. Please train it first.'}, 400
+        prices, last_date = prediction_inputs(symbol)
+        predictions = forecast_with_global_model(prices, days)
+        return {
+            'status': 'success',
+            'symbol': symbol,
+            'predictions': format_predictions(last_date, predictions),
+            'current_price': float(prices[-1]),
+            'last_date': last_date.strftime('%Y-%m-%d')
+        }, 200
+    
+    # Load model if not loaded
+    if model is None:
+        if not load_model_from_disk():
+            return {'status': 'error', 'message': 'Model not available. Please train first.'}, 400
+    
+    # Fetch recent data
+    recent_data = fetch_nifty_data()
+    if recent_data is None:
+        return {'status': 'error', 'message': 'Failed to fetch data'}, 500
+    
+    # Use Close prices
+    if 'Close' in recent_data.columns:
+        prices = recent_data['Close'].values.reshape(-1, 1)
+    else:
+        numeric_cols = recent_data.select_dtypes(include=[np.number]).columns
+        if len(numeric_cols) > 0:
+            prices = recent_data[numeric_cols[-1]].values.reshape(-1, 1)
+        else:
+            return {'status': 'error', 'message': 'No valid price data found'}, 500
+    
+    # Make predictions
+    predictions = forecast_prices(prices, days)
+    
+    # Generate dates
+    last_date = recent_data.index[-1]
+    if isinstance(last_date, str):
+        last_date = pd.to_datetime(last_date)
+    
+    results = format_predictions(last_date, predictions)
+    
+    return {
+        'status': 'success',
+        'predictions': results,
+        'current_price': float(prices[-1][0]),
+        'last_date': last_date.strftime('%Y-%m-%d')
+    }, 200
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """Make price predictions endpoint"""
     try:
-        # Load model if not loaded
-        if model is None:
-            if not load_model_from_disk():
-                return jsonify({'status': 'error', 'message': 'Model not available. Please train first.'}), 400
-        
         # Get prediction days from request
-        data = request.get_json()
-        days = data.get('days', 7)
-        
-        # Fetch recent data
-        recent_data = fetch_nifty_data()
-        if recent_data is None:
-            return jsonify({'status': 'error', 'message': 'Failed to fetch data'}), 500
-        
-        # Use Close prices
-        if 'Close' in recent_data.columns:
-            prices = recent_data['Close'].values.reshape(-1, 1)
-        else:
-            numeric_cols = recent_data.select_dtypes(include=[np.number]).columns
-            if len(numeric_cols) > 0:
-                prices = recent_data[numeric_cols[-1]].values.reshape(-1, 1)
-            else:
-                return jsonify({'status': 'error', 'message': 'No valid price data found'}), 500
+        data = request.get_json(silent=True) or {}
+        days = int(data.get('days', 7))
+        if not 1 <= days <= max_batch_days:
+            return jsonify({'status': 'error', 'message': f'days must be between 1 and {max_batch_days}'}), 400
+        symbol = normalize_symbol(data.get('symbol', 'NIFTY'))
         
-        # Scale data
-        scaled_prices = scaler.transform(prices)
+        # Horizons up to the precomputed maximum are a prefix of the snapshot's forecast
+        cached = snapshot_response(
+            ('predict', symbol),
+            lambda payload: payload if len(payload['predictions']) == days else
+            {**payload, 'predictions': payload['predictions'][:days]} if len(payload['predictions']) > days else None
+        )
+        if cached is not None:
+            return cached
         
-        # Prepare input sequence using advanced method
-        last_sequence = scaled_prices[-sequence_length:].reshape(1, 1, sequence_length, 1)
+        payload, status = build_prediction_payload(symbol, days)
+        return jsonify(payload), status
         
-        # Make predictions
-        predictions = []
-        current_sequence = last_sequence.copy()
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def build_historical_columns(symbol='NIFTY', start=None, end=None, interval='1d', indicator_names=None):
+    """Columns for /api/historical as NumPy arrays, or None if the range is empty
+    
+    Returns (metadata, columns, indicator names). With indicator_names only
+    those indicators are evaluated, over the returned bars plus the warm-up
+    they need.
+    """
+    interval = normalize_interval(interval)
+    # Bars needed before the window to warm up the indicators, EMA tails included
+    lookback = required_lookback(indicator_names)
+    
+    # Locate the range by binary search, with enough earlier bars to warm up the indicators
+    data, offset, first = price_store.query(symbol, start, end, interval, lookback=lookback, limit=200)
+    if len(data) == offset:
+        return None
+    
+    if indicator_names is not None:
+        indicators = evaluate_indicators(data, indicator_names, start=offset)
+    else:
+        # Daily indicators are read from the feature store; resampled bars are computed here
+        # Cumulative_Return is anchored at the first returned bar on every path
+        indicators = stored_indicators(symbol, data, offset) if interval == '1d' else None
+        if indicators is None:
+            indicators = evaluate_indicators(data, start=offset)
+    
+    columns = {
+        'date': data.index.values[offset:].astype('datetime64[D]'),
+        'index': np.arange(first + offset, first + len(data)),
+        'price': data['Close'].to_numpy(dtype=float)[offset:]
+    }
+    for name in ('Open', 'High', 'Low', 'Volume'):
+        if name in data.columns:
+            columns[name.lower()] = data[name].to_numpy(dtype=float)[offset:]
+    for name, values in indicators.items():
+        columns[name] = values[offset:]
+    
+    metadata = {'symbol': normalize_symbol(symbol), 'interval': interval}
+    return metadata, columns, list(indicators.keys())
+
+def build_historical_payload(symbol='NIFTY', start=None, end=None, interval='1d', indicator_names=None):
+    """Payload for /api/historical"""
+    result = build_historical_columns(symbol, start, end, interval, indicator_names)
+    if result is None:
+        return {'status': 'error', 'message': 'No data in the requested range'}, 404
+    metadata, columns, indicator_keys = result
+    
+    dates = pd.DatetimeIndex(columns['date']).strftime('%Y-%m-%d').tolist()
+    indexes = columns['index'].tolist()
+    values = {name: column.tolist() for name, column in columns.items() if name not in ('date', 'index')}
+    
+    historical_data = []
+    for i, date in enumerate(dates):
+        data_point = {'date': date, 'index': indexes[i]}
+        # Prices, volume and indicators, skipping missing values
+        for name, column in values.items():
+            if pd.notna(column[i]):
+                data_point[name] = float(column[i])
+        historical_data.append(data_point)
+    
+    return {
+        'status': 'success',
+        'symbol': metadata['symbol'],
+        'interval': metadata['interval'],
+        'data': historical_data,
+        'indicators': indicator_keys
+    }, 200
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Forecast many (symbol, days) items in one call
+    
+    Items are grouped by model and each group runs one batched forward pass
+    per horizon step. A failing item gets its own error entry without
+    failing the rest of the batch.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        items = body.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'status': 'error', 'message': 'Body must contain a non-empty "items" list'}), 400
+        if len(items) > max_batch_items:
+            return jsonify({'status': 'error', 'message': f'At most {max_batch_items} items per batch'}), 400
         
-        for _ in range(days):
-            # Predict next value
-            next_pred = model.predict(current_sequence, verbose=0)
-            predictions.append(next_pred[0, 0])
+        results = [None] * len(items)
+        groups = {}
+        stamp = model_stamp()
+        for index, item in enumerate(items):
+            try:
+                symbol = normalize_symbol(str(item.get('symbol', 'NIFTY')))
+                days = int(item.get('days', 7))
+                if not 1 <= days <= max_batch_days:
+                    raise ValueError(f'days must be between 1 and {max_batch_days}')
+            except (AttributeError, TypeError, ValueError) as e:
+                results[index] = {'status': 'error', 'message': f'Invalid item: {e}'}
+                continue
             
-            # Update sequence for next prediction
-            current_sequence = np.roll(current_sequence, -1, axis=2)
-            current_sequence[0, 0, -1, 0] = next_pred[0, 0]
-        
-        # Inverse transform predictions
-        predictions = scaler.inverse_transform(np.array(predictions).reshape(-1, 1))
-        
-        # Generate dates
-        last_date = recent_data.index[-1]
-        if isinstance(last_date, str):
-            last_date = pd.to_datetime(last_date)
-        
-        prediction_dates = [last_date + timedelta(days=i+1) for i in range(days)]
+            # Serve from the end-of-day snapshot when it covers the horizon
+            hit = snapshot_store.lookup(('predict', symbol), stamp)
+            if hit is not None and len(hit[1]['predictions']) >= days:
+                payload = hit[1]
+                results[index] = {**payload, 'symbol': symbol, 'days': days,
+                                  'predictions': payload['predictions'][:days]}
+                continue
+            
+            kind = 'nifty' if symbol == 'NIFTY' else 'global'
+            groups.setdefault(kind, {}).setdefault(symbol, []).append((index, days))
         
-        # Format results
-        results = []
-        for i, (date, pred) in enumerate(zip(prediction_dates, predictions)):
-            results.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'predicted_price': float(pred[0]),
-                'day': i + 1
-            })
+        for kind, symbols in groups.items():
+            loaded = (model is not None or load_model_from_disk()) if kind == 'nifty' else \
+                (global_model is not None or load_global_model_from_disk())
+            
+            # One input row per symbol, forecasting the longest horizon requested for it
+            histories, rows = [], []
+            for symbol, item_days in symbols.items():
+                try:
+                    if not loaded:
+                        raise RuntimeError('Model not available. Please train first.' if kind == 'nifty' else
+                                           'Global model not available. Please train it first.')
+                    prices, last_date = prediction_inputs(symbol)
+                    # Checked per symbol so one bad history does not fail the whole group
+                    check_forecast_history(kind, prices)
+                    histories.append(prices)
+                    rows.append((symbol, prices, last_date, item_days))
+                except Exception as e:
+                    for index, days in item_days:
+                        results[index] = {'status': 'error', 'symbol': symbol, 'days': days, 'message': str(e)}
+            if not rows:
+                continue
+            
+            try:
+                forecasts = forecast_batch(kind, histories, [max(days for _, days in row[3]) for row in rows])
+            except Exception as e:
+                for symbol, _, _, item_days in rows:
+                    for index, days in item_days:
+                        results[index] = {'status': 'error', 'symbol': symbol, 'days': days, 'message': str(e)}
+                continue
+            
+            for (symbol, prices, last_date, item_days), forecast in zip(rows, forecasts):
+                predictions = format_predictions(last_date, forecast)
+                for index, days in item_days:
+                    results[index] = {
+                        'status': 'success',
+                        'symbol': symbol,
+                        'days': days,
+                        'predictions': predictions[:days],
+                        'current_price': float(prices[-1]),
+                        'last_date': last_date.strftime('%Y-%m-%d')
+                    }
         
         return jsonify({
             'status': 'success',
-            'predictions': results,
-            'current_price': float(prices[-1][0]),
-            'last_date': last_date.strftime('%Y-%m-%d')
+            'results': results,
+            'errors': sum(1 for result in results if result['status'] != 'success')
         })
         
     except Exception as e:
@@ -417,89 +1054,338 @@ def predict():
 
 @app.route('/api/historical', methods=['GET'])
 def get_historical_data():
-    """Get historical NIFTY data with technical indicators"""
+    """Get historical price data with technical indicators
+    
+    Query parameters: symbol (default NIFTY), start, end (YYYY-MM-DD),
+    interval (1d, 1wk or 1mo) and indicators (comma separated names, default
+    all). Without start the last 200 bars are returned.
+    
+    JSON rows by default; clients can ask for binary columns with the Accept
+    header or format=arrow|packed.
+    """
     try:
-        data = fetch_nifty_data()
-        if data is None:
-            return jsonify({'status': 'error', 'message': 'Failed to fetch data'}), 500
+        symbol = request.args.get('symbol', 'NIFTY')
+        start = request.args.get('start')
+        end = request.args.get('end')
+        interval = normalize_interval(request.args.get('interval', '1d'))
+        indicator_names = request.args.get('indicators')
+        if indicator_names is not None:
+            indicator_names = parse_indicator_names(indicator_names)
+        mimetype = columnar.negotiate(request.accept_mimetypes, request.args.get('format'))
         
-        # Calculate technical indicators
-        indicators = calculate_technical_indicators(data)
+        if mimetype != columnar.JSON_MIMETYPE:
+            result = build_historical_columns(symbol, start, end, interval, indicator_names)
+            if result is None:
+                return jsonify({'status': 'error', 'message': 'No data in the requested range'}), 404
+            metadata, columns, indicator_keys = result
+            metadata['indicators'] = indicator_keys
+            response = app.response_class(columnar.encode(columns, mimetype, metadata, exact=volume_columns),
+                                          mimetype=mimetype)
+            response.headers['Vary'] = 'Accept'
+            return response
         
-        # Convert to JSON serializable format
-        if 'Close' in data.columns:
-            prices = data['Close']
-        else:
-            numeric_cols = data.select_dtypes(include=[np.number]).columns
-            if len(numeric_cols) > 0:
-                prices = data[numeric_cols[-1]]
-            else:
-                return jsonify({'status': 'error', 'message': 'No valid price data found'}), 500
+        # The default view of each precomputed symbol is served from the snapshot
+        if start is None and end is None and interval == '1d' and indicator_names is None:
+            cached = snapshot_response(('historical', normalize_symbol(symbol)))
+            if cached is not None:
+                cached.headers['Vary'] = 'Accept'
+                return cached
         
-        historical_data = []
-        for i, (date, price) in enumerate(prices.items()):
-            if pd.notna(price):
-                data_point = {
-                    'date': date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date),
-                    'price': float(price),
-                    'index': i
-                }
-                
-                # Add technical indicators
-                for indicator_name, values in indicators.items():
-                    if i < len(values) and pd.notna(values[i]):
-                        data_point[indicator_name] = float(values[i])
-                
-                historical_data.append(data_point)
+        payload, status = build_historical_payload(symbol, start, end, interval, indicator_names)
+        response = jsonify(payload)
+        response.headers['Vary'] = 'Accept'
+        return response, status
         
-        return jsonify({
-            'status': 'success',
-            'data': historical_data[-200:],  # Last 200 data points
-            'indicators': list(indicators.keys())
-        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/precompute', methods=['GET', 'POST'])
+def precompute():
+    """Show the precompute status (GET) or start a snapshot run now (POST)"""
+    if request.method == 'POST':
+        precompute_scheduler.trigger()
+        return jsonify({'status': 'success', 'message': 'Precompute started'}), 202
+    
+    snapshot = snapshot_store.current
+    return jsonify({
+        'status': 'success',
+        'scheduler': precompute_scheduler.status,
+        'symbols': precompute_symbols,
+        'max_days': precompute_max_days,
+        'snapshot': {
+            'id': snapshot.id,
+            'created_at': datetime.fromtimestamp(snapshot.created_at).isoformat(timespec='seconds'),
+            'entries': len(snapshot.entries),
+            'valid': snapshot.stamp == model_stamp()
+        } if snapshot is not None else None
+    })
+
+@app.route('/api/correlation', methods=['GET'])
+def get_correlation():
+    """Get the rolling-window correlation matrix of daily returns
+    
+    Query parameters: window (bars, default 60), symbols (comma separated,
+    default all), end (YYYY-MM-DD, default the latest date all the symbols
+    have data for) and min_periods.
+    """
+    try:
+        window = int(request.args.get('window', 60))
+        if not 5 <= window <= 1000:
+            return jsonify({'status': 'error', 'message': 'window must be between 5 and 1000'}), 400
+        symbols = request.args.get('symbols')
+        symbols = [normalize_symbol(symbol) for symbol in symbols.split(',')] if symbols else None
+        min_periods = request.args.get('min_periods')
+        
+        result = correlation_service.correlations(
+            window,
+            symbols=symbols,
+            end=request.args.get('end'),
+            min_periods=int(min_periods) if min_periods else None
+        )
+        return jsonify({'status': 'success', **result})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def list_option(options, name, default):
+    """A list-valued option from a JSON body, rejecting scalars and objects"""
+    value = options.get(name, default)
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"{name} must be a list")
+    return value
+
+def build_scenario_columns(options):
+    """Simulate scenario paths for /api/scenarios
+    
+    Returns (metadata, fan columns, threshold rows).
+    """
+    symbol = normalize_symbol(options.get('symbol', 'NIFTY'))
+    days = int(options.get('days', 30))
+    paths = int(options.get('paths', 10000))
+    method = options.get('model', 'gbm')
+    seed = options.get('seed')
+    seed = int(seed) if seed is not None else None
+    quantiles = [float(q) for q in list_option(options, 'quantiles', scenarios.DEFAULT_QUANTILES)]
+    if not 1 <= days <= max_scenario_days:
+        raise ValueError(f"days must be between 1 and {max_scenario_days}")
+    if not 1 <= paths <= max_scenario_paths:
+        raise ValueError(f"paths must be between 1 and {max_scenario_paths}")
+    if not quantiles or not all(0 <= q <= 1 for q in quantiles):
+        raise ValueError('quantiles must be between 0 and 1')
+    
+    closes, last_date = prediction_inputs(symbol)
+    closes = np.asarray(closes, dtype=float)
+    current_price = float(closes[-1])
+    
+    if method == 'gbm':
+        mu, sigma = scenarios.gbm_parameters(
+            closes,
+            volatility=options.get('volatility', 'returns'),
+            drift=bool(options.get('drift', True))
+        )
+        step = scenarios.gbm_steps(mu, sigma)
+        parameters = {'drift': mu, 'volatility': sigma, 'volatility_source': options.get('volatility', 'returns')}
+    elif method == 'bootstrap':
+        history = int(options.get('history', 1000))
+        returns = scenarios.log_returns(closes)[-history:]
+        step = scenarios.bootstrap_steps(returns, block=int(options.get('block', 5)))
+        parameters = {'block': step.block, 'history': len(returns)}
+    else:
+        raise ValueError("model must be 'gbm' or 'bootstrap'")
+    
+    # Thresholds as absolute prices and/or percentage moves from the current price
+    thresholds = [float(price) for price in list_option(options, 'thresholds', [])]
+    thresholds += [current_price * (1 + float(pct) / 100) for pct in list_option(options, 'threshold_pct', [])]
+    if any(price <= 0 for price in thresholds):
+        raise ValueError('thresholds must be positive prices')
+    
+    result = scenarios.simulate(current_price, days, paths, step, quantiles, thresholds, seed=seed)
+    
+    columns = {
+        'date': np.datetime64(last_date.date(), 'D') + np.arange(1, days + 1),
+        'day': np.arange(1, days + 1),
+        'mean': result['mean']
+    }
+    for i, q in enumerate(quantiles):
+        columns[f"p{q * 100:g}"] = result['quantiles'][:, i]
+    
+    threshold_rows = [{
+        'price': price,
+        'change_pct': (price / current_price - 1) * 100,
+        'prob_above_end': float(result['prob_above_end'][i]),
+        'prob_below_end': float(result['prob_below_end'][i]),
+        'prob_touch': float(result['prob_touch'][i])
+    } for i, price in enumerate(thresholds)]
+    
+    metadata = {
+        'symbol': symbol,
+        'model': method,
+        'paths': paths,
+        'days': days,
+        'seed': seed,
+        'current_price': current_price,
+        'last_date': last_date.strftime('%Y-%m-%d'),
+        'parameters': parameters
+    }
+    return metadata, columns, threshold_rows
+
+@app.route('/api/scenarios', methods=['POST'])
+def simulate_scenarios():
+    """Monte Carlo price scenarios as a quantile fan plus threshold probabilities
+    
+    Body: symbol, days, paths, model ('gbm' or 'bootstrap'), seed, quantiles,
+    thresholds (prices), threshold_pct (moves in percent), and for GBM
+    volatility ('returns' or 'indicator') and drift, for the bootstrap block
+    and history. The fan can also be fetched as binary columns.
+    """
+    try:
+        options = request.get_json(silent=True) or {}
+        mimetype = columnar.negotiate(request.accept_mimetypes, request.args.get('format'))
+        metadata, columns, threshold_rows = build_scenario_columns(options)
+        
+        if mimetype != columnar.JSON_MIMETYPE:
+            metadata['thresholds'] = threshold_rows
+            response = app.response_class(columnar.encode(columns, mimetype, metadata), mimetype=mimetype)
+            response.headers['Vary'] = 'Accept'
+            return response
+        
+        dates = pd.DatetimeIndex(columns['date']).strftime('%Y-%m-%d').tolist()
+        values = {name: column.tolist() for name, column in columns.items() if name != 'date'}
+        fan = [dict({'date': date}, **{name: column[i] for name, column in values.items()})
+               for i, date in enumerate(dates)]
+        response = jsonify({'status': 'success', **metadata, 'fan': fan, 'thresholds': threshold_rows})
+        response.headers['Vary'] = 'Accept'
+        return response
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def build_analog_payload(options):
+    """Nearest historical windows to a symbol's latest window, for /api/analogs
+    
+    The forward paths of the matches are summarised per day, and their mean
+    applied to the current price gives a forecast in the usual prediction
+    format.
+    """
+    symbol = normalize_symbol(options.get('symbol', 'NIFTY'))
+    k = int(options.get('k', 10))
+    horizon = int(options.get('horizon', 20))
+    if not 1 <= k <= max_analog_matches:
+        raise ValueError(f"k must be between 1 and {max_analog_matches}")
+    if not 1 <= horizon <= max_analog_horizon:
+        raise ValueError(f"horizon must be between 1 and {max_analog_horizon}")
+    
+    closes, last_date = prediction_inputs(symbol)
+    closes = np.asarray(closes, dtype=float)
+    # Index new bars first; a no-op when nothing was appended
+    analog_index.refresh()
+    
+    # Leave out the symbol's own windows overlapping the query window
+    dates = analog_index.dates.get(symbol)
+    exclude = (symbol, dates[max(0, len(dates) - sequence_length)]) if dates is not None and len(dates) else None
+    matches = analog_index.search(closes, k=k, horizon=horizon, exclude=exclude)
+    if not matches:
+        raise LookupError('No analog windows with enough forward history')
+    
+    forward = np.array([match['forward'] for match in matches])
+    current_price = float(closes[-1])
+    return {
+        'symbol': symbol,
+        'current_price': current_price,
+        'last_date': last_date.strftime('%Y-%m-%d'),
+        'horizon': horizon,
+        'matches': [dict(match, forward=match['forward'].tolist()) for match in matches],
+        'summary': {
+            'mean': forward.mean(axis=0).tolist(),
+            'median': np.median(forward, axis=0).tolist(),
+            'p10': np.quantile(forward, 0.1, axis=0).tolist(),
+            'p90': np.quantile(forward, 0.9, axis=0).tolist(),
+            'up_fraction': float((forward[:, -1] > 0).mean())
+        },
+        'predictions': format_predictions(last_date, current_price * (1 + forward.mean(axis=0))),
+        'index': analog_index.stats()
+    }
+
+@app.route('/api/analogs', methods=['GET', 'POST'])
+def find_analogs():
+    """Past windows across the archive most similar to a symbol's latest window
+    
+    Parameters (query string or JSON body): symbol, k (matches) and horizon
+    (days of what happened next).
+    """
+    try:
+        options = dict(request.args.items())
+        options.update(request.get_json(silent=True) or {})
+        return jsonify({'status': 'success', **build_analog_payload(options)})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/indices', methods=['GET', 'POST'])
+def sector_indices():
+    """List the sector and basket indices (GET) or create a basket index (POST)
+    
+    POST body: name, symbols (list) and weighting ('equal' or 'turnover').
+    """
+    try:
+        if request.method == 'GET':
+            return jsonify({'status': 'success', 'indices': index_engine.summary()})
         
+        options = request.get_json(silent=True) or {}
+        if not options.get('name') or not isinstance(options.get('symbols'), list):
+            return jsonify({'status': 'error', 'message': 'Body must contain "name" and a "symbols" list'}), 400
+        name = index_engine.save_basket(options['name'], options['symbols'], options.get('weighting', 'equal'))
+        index_engine.register_index(name, ttl=int(os.environ.get('PRICE_CACHE_SECONDS', '900')))
+        price_store.register(name, index_engine.update(name))
+        summary = next(entry for entry in index_engine.summary() if entry['symbol'] == name)
+        return jsonify({'status': 'success', 'index': summary}), 201
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/stream', methods=['GET'])
+def stream_bars():
+    """Stream new bars with incremental indicators as server-sent events"""
+    include_forecast = request.args.get('forecast', '1') != '0'
+    broadcaster = get_bar_broadcaster()
+    subscriber = broadcaster.subscribe()
+    return Response(
+        broadcaster.events(subscriber, include_forecast),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/market-links', methods=['GET'])
 def get_market_links():
     """Get external stock market links"""
-    links = [
-        {
-            'name': 'NSE India',
-            'url': 'https://www.nseindia.com/',
-            'description': 'Official National Stock Exchange website'
-        },
-        {
-            'name': 'Money Control',
-            'url': 'https://www.moneycontrol.com/india/stockpricequote/',
-            'description': 'Comprehensive stock market information'
-        },
-        {
-            'name': 'Yahoo Finance',
-            'url': 'https://finance.yahoo.com/quote/%5ENSEI/',
-            'description': 'NIFTY 50 on Yahoo Finance'
-        },
-        {
-            'name': 'Trading View',
-            'url': 'https://www.tradingview.com/symbols/NSE-NIFTY/',
-            'description': 'Advanced charting and analysis'
-        },
-        {
-            'name': 'Investing.com',
-            'url': 'https://in.investing.com/indices/s-p-cnx-nifty',
-            'description': 'Real-time NIFTY data and news'
-        }
-    ]
-    
     return jsonify({
         'status': 'success',
-        'links': links
+        'links': market_links
     })
 
 if __name__ == '__main__':
     # Try to load existing model
     load_model_from_disk()
     
+    # Start the end-of-day precompute scheduler (once, in the reloader's child process)
+    if os.environ.get('PRECOMPUTE_ENABLED', '1') == '1' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        precompute_scheduler.start()
+    
     # Start the Flask app
     app.run(host='0.0.0.0', port=5000, debug=True)
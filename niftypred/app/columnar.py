@@ -0,0 +1,127 @@
+"""
+Compact columnar encodings for bulk time-series responses
+Instead of JSON rows with repeated keys, columns are sent as raw arrays:
+Arrow IPC streams when pyarrow is installed, otherwise (or on request) a
+small packed format of little-endian columns behind a JSON header.
+Prices and indicators are narrowed to float32 (about 7 significant digits),
+while columns named as exact, such as volumes, keep 64-bit precision. Dates
+are sent as days since 1970-01-01.
+
+Packed layout:
+    b'NPC1' | uint32 header length | JSON header | padding to 8 bytes | columns
+The header lists each column's name, dtype, byte offset (from the start of
+the column data) and byte length, plus the row count and metadata.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+JSON_MIMETYPE = 'application/json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+PACKED_MIMETYPE = 'application/vnd.niftypred.columns'
+
+FORMATS = {'json': JSON_MIMETYPE, 'arrow': ARROW_MIMETYPE, 'packed': PACKED_MIMETYPE, 'f32': PACKED_MIMETYPE}
+
+MAGIC = b'NPC1'
+
+
+def available_mimetypes():
+    """Response types that can be produced, JSON first so it stays the default"""
+    return [JSON_MIMETYPE] + ([ARROW_MIMETYPE] if pa is not None else []) + [PACKED_MIMETYPE]
+
+
+def negotiate(accept_mimetypes, requested=None):
+    """Pick the response mimetype from ?format= or else the Accept header"""
+    if requested:
+        mimetype = FORMATS.get(requested.strip().lower())
+        if mimetype is None:
+            raise ValueError(f"Unsupported format '{requested}'. Use {', '.join(sorted(FORMATS))}")
+        if mimetype == ARROW_MIMETYPE and pa is None:
+            raise ValueError('Arrow output needs pyarrow installed; use format=packed instead')
+        return mimetype
+    return accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE) or JSON_MIMETYPE
+
+
+def _wire_column(values, exact=False):
+    """Little-endian int32 days for dates, int32 or float32 for other columns
+
+    Exact columns are sent as int64 or float64 instead. A copy is made
+    unless the column already has its wire dtype.
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return np.ascontiguousarray(values.astype('datetime64[D]').astype('<i8').astype('<i4'))
+    if np.issubdtype(values.dtype, np.integer):
+        return np.ascontiguousarray(values, dtype='<i8' if exact else '<i4')
+    return np.ascontiguousarray(values, dtype='<f8' if exact else '<f4')
+
+
+def encode_packed(columns, metadata=None, exact=()):
+    """Packed columns with a JSON header; columns named in exact keep 64-bit precision"""
+    arrays = {name: _wire_column(values, name in exact) for name, values in columns.items()}
+    rows = len(next(iter(arrays.values()))) if arrays else 0
+
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        layout.append({'name': name, 'dtype': array.dtype.str, 'offset': offset, 'length': array.nbytes,
+                       'unit': 'days' if np.issubdtype(np.asarray(columns[name]).dtype, np.datetime64) else None})
+        offset += array.nbytes + (-array.nbytes % 8)
+
+    header = json.dumps({'rows': rows, 'columns': layout, 'metadata': metadata or {}}).encode()
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    parts = [MAGIC, struct.pack('<I', len(header)), header]
+    for array in arrays.values():
+        parts.append(memoryview(array).cast('B'))
+        parts.append(b'\0' * (-array.nbytes % 8))
+    return b''.join(parts)
+
+
+def decode_packed(buffer):
+    """(columns, metadata) from encode_packed() output; columns are views into buffer"""
+    if bytes(buffer[:4]) != MAGIC:
+        raise ValueError('Not a packed column buffer')
+    header_length = struct.unpack('<I', bytes(buffer[4:8]))[0]
+    header = json.loads(bytes(buffer[8:8 + header_length]))
+    start = 8 + header_length
+    columns = {}
+    for column in header['columns']:
+        values = np.frombuffer(buffer, dtype=column['dtype'], count=header['rows'],
+                               offset=start + column['offset'])
+        if column.get('unit') == 'days':
+            values = values.astype('datetime64[D]')
+        columns[column['name']] = values
+    return columns, header['metadata']
+
+
+def encode_arrow(columns, metadata=None, exact=()):
+    """Arrow IPC stream with one record batch, with the packed format's column types"""
+    arrays = []
+    for name, values in columns.items():
+        wire = _wire_column(values, name in exact)
+        if np.issubdtype(np.asarray(values).dtype, np.datetime64):
+            arrays.append(pa.Array.from_buffers(pa.date32(), len(wire), [None, pa.py_buffer(wire)]))
+        else:
+            arrays.append(pa.array(wire, from_pandas=True))
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(columns))
+    batch = batch.replace_schema_metadata({'metadata': json.dumps(metadata or {})})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(columns, mimetype, metadata=None, exact=()):
+    """Encode columns for a negotiated binary mimetype"""
+    if mimetype == ARROW_MIMETYPE:
+        return encode_arrow(columns, metadata, exact)
+    return encode_packed(columns, metadata, exact)
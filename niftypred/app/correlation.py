@@ -0,0 +1,252 @@
+"""
+Rolling correlation engine
+Aligns NIFTY, the archive constituents and the global indices on a common
+date axis and maintains rolling-window correlation matrices of their daily
+log returns from running sums of cross-products, so a new bar costs
+O(symbols^2) instead of O(symbols^2 * window).
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+GLOBAL_INDICES = ['SP500', 'DOW', 'NASDAQ', 'FTSE100', 'NIKKEI', 'HANG_SENG']
+
+
+class RollingCorrelation:
+    """Correlation matrix over the last `window` rows of a returns panel
+
+    Missing values are handled pairwise: each pair only uses the rows where
+    both symbols have a return.
+    """
+
+    def __init__(self, symbols, window):
+        self.symbols = list(symbols)
+        self.window = window
+        size = len(self.symbols)
+        self.rows = deque(maxlen=window)
+        self.dates = deque(maxlen=window)
+        self.count = np.zeros((size, size))
+        self.sum_x = np.zeros((size, size))
+        self.sum_xx = np.zeros((size, size))
+        self.sum_xy = np.zeros((size, size))
+        self._updates = 0
+
+    def _accumulate(self, row, sign):
+        present = ~np.isnan(row)
+        values = np.where(present, row, 0.0)
+        mask = present.astype(float)
+        # Entry [i, j] only counts rows where both i and j are present
+        self.count += sign * np.outer(mask, mask)
+        self.sum_x += sign * np.outer(values, mask)
+        self.sum_xx += sign * np.outer(values * values, mask)
+        self.sum_xy += sign * np.outer(values, values)
+
+    def _rebuild(self):
+        """Recompute the running sums from the buffered rows"""
+        if not self.rows:
+            return
+        panel = np.array(self.rows)
+        present = ~np.isnan(panel)
+        values = np.where(present, panel, 0.0)
+        mask = present.astype(float)
+        self.count = mask.T @ mask
+        self.sum_x = values.T @ mask
+        self.sum_xx = (values * values).T @ mask
+        self.sum_xy = values.T @ values
+
+    def load(self, dates, panel):
+        """Initialise from the last `window` rows of a (dates x symbols) array"""
+        self.rows.clear()
+        self.dates.clear()
+        for date, row in zip(dates[-self.window:], panel[-self.window:]):
+            self.dates.append(date)
+            self.rows.append(np.asarray(row, dtype=float))
+        self._rebuild()
+
+    def push(self, date, row):
+        """Slide the window forward by one row"""
+        row = np.asarray(row, dtype=float)
+        if len(self.rows) == self.window:
+            self._accumulate(self.rows[0], -1)
+        self.rows.append(row)
+        self.dates.append(date)
+        self._accumulate(row, 1)
+
+        # Refresh from the buffer now and then so rounding errors can't build up
+        self._updates += 1
+        if self._updates % self.window == 0:
+            self._rebuild()
+
+    def matrix(self, min_periods=2):
+        """Pearson correlation matrix (NaN where a pair has too few rows)"""
+        n = self.count
+        sum_y = self.sum_x.T
+        sum_yy = self.sum_xx.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = n * self.sum_xy - self.sum_x * sum_y
+            variance = (n * self.sum_xx - self.sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+            corr = covariance / np.sqrt(np.clip(variance, 0, None))
+        corr[(n < max(min_periods, 2)) | ~np.isfinite(corr)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationService:
+    """Caches RollingCorrelation engines per window length and end date
+
+    The panel is rebuilt only when a symbol's price series changes in the
+    store; an engine is moved to a later end date by pushing the new rows.
+    """
+
+    def __init__(self, store, symbols=None, max_fill=5, max_engines=16):
+        self.store = store
+        self.max_engines = max_engines
+        self.requested_symbols = symbols
+        self.max_fill = max_fill
+        self.symbols = []
+        self.dates = None
+        self.panel = None
+        self.last_dates = {}
+        self._sources = None
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def _default_symbols(self):
+        archive = [symbol for symbol in self.store.symbols() if symbol != 'NIFTY']
+        indices = [symbol for symbol in GLOBAL_INDICES if symbol in archive]
+        return ['NIFTY'] + indices + [symbol for symbol in archive if symbol not in indices]
+
+    def _load_series(self):
+        series = {}
+        for symbol in self.requested_symbols or self._default_symbols():
+            try:
+                series[symbol] = self.store.get(symbol)
+            except Exception as e:
+                print(f"Skipping {symbol} for correlations: {e}")
+        return series
+
+    def _align(self, series):
+        """Daily log returns on the union of trading dates"""
+        closes = pd.concat(
+            {symbol: pd.Series(s.columns['Close'], index=s.dates) for symbol, s in series.items()},
+            axis=1
+        ).sort_index()
+        # Bridge holidays that differ between markets, but not long gaps
+        closes = closes.ffill(limit=self.max_fill)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.log(closes).diff()
+        returns = returns.replace([np.inf, -np.inf], np.nan).iloc[1:]
+        return list(closes.columns), returns.index.values, returns.to_numpy()
+
+    @staticmethod
+    def _still_valid(engine, dates, panel):
+        """Whether an engine's buffered rows are unchanged in a rebuilt panel"""
+        if not engine.dates:
+            return False
+        stop = int(np.searchsorted(dates, engine.dates[-1], side='right'))
+        start = stop - len(engine.rows)
+        if start < 0 or not np.array_equal(dates[start:stop], np.array(engine.dates)):
+            return False
+        # Revised bars for dates already in the window change these rows
+        return np.allclose(panel[start:stop], np.array(engine.rows), rtol=0, atol=1e-12, equal_nan=True)
+
+    def _unchanged_sources(self, series):
+        return (self._sources is not None and series.keys() == self._sources.keys()
+                and all(s is self._sources[symbol] for symbol, s in series.items()))
+
+    def refresh(self):
+        """Pick up changed price series, dropping engines whose rows changed"""
+        with self._lock:
+            series = self._load_series()
+            if self._unchanged_sources(series):
+                return
+            symbols, dates, panel = self._align(series)
+
+            if symbols != self.symbols:
+                self._engines.clear()
+            for key, engine in list(self._engines.items()):
+                if not self._still_valid(engine, dates, panel):
+                    del self._engines[key]
+
+            self.symbols, self.dates, self.panel = symbols, dates, panel
+            self.last_dates = {symbol: np.datetime64(s.dates[-1], 'D') for symbol, s in series.items() if len(s.dates)}
+            self._sources = series
+
+    def shared_end(self, symbols):
+        """Latest date every one of the symbols has a bar by
+
+        Without it the window would end on the newest bar of any symbol, and
+        symbols whose history stops earlier (the archive constituents end in
+        2021) would have no returns in it.
+        """
+        dates = [self.last_dates[symbol] for symbol in symbols if symbol in self.last_dates]
+        return min(dates) if dates else None
+
+    def _engine(self, window, end=None):
+        """Engine for the `window` rows ending on `end` (default the latest date)
+
+        Engines are cached per (window, end date). A request for a later end
+        advances the closest earlier engine of the same window by pushing
+        the rows in between, if that is cheaper than loading the window.
+        """
+        stop = len(self.dates) if end is None else int(
+            np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).date(), 'D'), side='right'))
+        if stop == 0:
+            return RollingCorrelation(self.symbols, window)
+        key = (window, self.dates[stop - 1])
+        engine = self._engines.pop(key, None)
+
+        if engine is None:
+            earlier = [k for k in self._engines if k[0] == window and k[1] < key[1]]
+            if earlier:
+                start = int(np.searchsorted(self.dates, max(earlier)[1], side='right'))
+                if stop - start < window:
+                    engine = self._engines.pop(max(earlier))
+                    for date, row in zip(self.dates[start:stop], self.panel[start:stop]):
+                        engine.push(date, row)
+        if engine is None:
+            engine = RollingCorrelation(self.symbols, window)
+            engine.load(self.dates[:stop], self.panel[:stop])
+
+        # Most recently used last; evict the oldest
+        self._engines[key] = engine
+        while len(self._engines) > self.max_engines:
+            self._engines.pop(next(iter(self._engines)))
+        return engine
+
+    def correlations(self, window, symbols=None, end=None, min_periods=None):
+        """Correlation matrix for a subset of symbols as of `end`
+
+        end defaults to the latest date all of the symbols have data for.
+        """
+        self.refresh()
+        with self._lock:
+            if self.panel is None or not len(self.dates):
+                raise LookupError('No price data available for correlations')
+            if symbols:
+                missing = [symbol for symbol in symbols if symbol not in self.symbols]
+                if missing:
+                    raise LookupError(f"Unknown symbols: {', '.join(missing)}")
+            else:
+                symbols = self.symbols
+
+            if end is None:
+                end = self.shared_end(symbols)
+            engine = self._engine(window, end)
+            if not engine.dates:
+                raise LookupError('No data before the requested date')
+            matrix = engine.matrix(min_periods or max(2, window // 2))
+            positions = [self.symbols.index(symbol) for symbol in symbols]
+            subset = matrix[np.ix_(positions, positions)]
+            observations = engine.count[np.ix_(positions, positions)]
+            as_of = pd.Timestamp(engine.dates[-1]).strftime('%Y-%m-%d')
+
+        return {
+            'window': window,
+            'as_of': as_of,
+            'symbols': symbols,
+            'matrix': [[None if np.isnan(value) else round(float(value), 6) for value in row] for row in subset],
+            'observations': observations.astype(int).tolist()
+        }
@@ -0,0 +1,277 @@
+"""
+Materialized feature store
+Persists per-symbol indicator columns (little-endian float64) and
+normalized price windows (float32) as raw files with a JSON manifest, read
+back with np.memmap. New bars are appended incrementally (indicator state is
+kept between runs) and every feature definition change gets its own
+versioned directory.
+
+Files are only ever extended in place. A rebuild writes new files and
+renames them over the old ones, so readers that mapped the previous files
+keep a valid (old) view instead of a truncated one.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from price_store import normalize_symbol
+from streaming import IncrementalIndicators, frame_to_bars
+
+FEATURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'features')
+
+INDICATOR_COLUMNS = [
+    'MA_10_days', 'MA_50_days', 'MA_100_days', 'SMA_20', 'SMA_50', 'EMA_12', 'EMA_26',
+    'MACD', 'MACD_Signal', 'MACD_Histogram', 'RSI', 'BB_Upper', 'BB_Lower', 'BB_Middle',
+    'BB_Width', 'Volume_SMA', 'Volume', 'Volume_Ratio', 'Daily_Return', 'Price_Change',
+    'Price_Change_Pct', 'Volatility_20', 'Volatility_50'
+]
+
+# Changing anything here (or the indicator code version) materializes into a new directory
+FEATURE_DEFINITION = {
+    'indicator_version': 1,
+    'columns': ['Close'] + INDICATOR_COLUMNS,
+    'window_length': 101,  # sequence_length inputs + 1 target
+    'window_normalization': 'relative_to_first',
+    'feature_dtype': 'float64'
+}
+
+DTYPE = np.dtype('<f4')  # windows
+FEATURE_DTYPE = np.dtype('<f8')  # indicator columns, served as-is by /api/historical
+
+
+def definition_version(definition):
+    """Short stable hash identifying a feature definition"""
+    encoded = json.dumps(definition, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def normalized_windows(closes, length):
+    """Windows of `length` closes, each relative to its first value
+
+    Row i is (p[i:i+length] - p[i]) / p[i], the same normalization that
+    prepare_advanced_data() applies.
+    """
+    closes = np.asarray(closes, dtype=float)
+    if len(closes) < length:
+        return np.empty((0, length), dtype=DTYPE)
+    windows = np.lib.stride_tricks.sliding_window_view(closes, length)
+    return ((windows - windows[:, :1]) / windows[:, :1]).astype(DTYPE)
+
+
+class FeatureSet:
+    """Read-only, memory-mapped view of one symbol's materialized features"""
+
+    def __init__(self, directory, manifest):
+        self.manifest = manifest
+        self.columns = manifest['columns']
+        self.rows = manifest['rows']
+        self.dates = np.fromfile(os.path.join(directory, 'dates.i8'), dtype='<i8',
+                                 count=self.rows).astype('datetime64[D]')
+        self.values = self._map(directory, 'features.f8', (self.rows, len(self.columns)), FEATURE_DTYPE)
+        self.windows = self._map(directory, 'windows.f32', (manifest['windows'], manifest['window_length']), DTYPE)
+
+    @staticmethod
+    def _map(directory, name, shape, dtype):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(directory, name), dtype=dtype, mode='r', shape=shape)
+
+    def locate(self, start=None, end=None):
+        """Binary search the [lo, hi) row range covering start..end (inclusive)"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start).date(), 'D')))
+        hi = self.rows if end is None else int(
+            np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).date(), 'D'), side='right'))
+        return lo, max(lo, hi)
+
+    def column(self, name, lo=0, hi=None):
+        return self.values[lo:hi, self.columns.index(name)]
+
+    def frame(self, lo=0, hi=None, columns=None):
+        """Feature rows lo..hi as a DataFrame indexed by date"""
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.column(name, lo, hi) for name in columns},
+                            index=pd.DatetimeIndex(self.dates[lo:hi], name='Date'))
+
+    def training_arrays(self, start=None, sequence_length=None):
+        """(X, y) from the stored windows, optionally only windows starting on/after start"""
+        sequence_length = sequence_length or self.manifest['window_length'] - 1
+        lo = self.locate(start)[0] if start is not None else 0
+        windows = self.windows[lo:]
+        X = windows[:, :sequence_length].reshape(-1, sequence_length, 1)
+        y = windows[:, sequence_length].reshape(-1, 1, 1)
+        return X, y
+
+
+class FeatureStore:
+    """Materializes features per symbol from the price store
+
+    `indicator_fn` is calculate_technical_indicators(); it is used for full
+    (re)builds while appends reuse the persisted IncrementalIndicators state.
+    """
+
+    def __init__(self, price_store, indicator_fn, root=FEATURES_DIR, definition=FEATURE_DEFINITION):
+        self.price_store = price_store
+        self.indicator_fn = indicator_fn
+        self.definition = definition
+        self.version = definition_version(definition)
+        self.root = os.path.join(root, self.version)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _symbol_lock(self, symbol):
+        with self._lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _directory(self, symbol):
+        return os.path.join(self.root, symbol)
+
+    def _read_manifest(self, symbol):
+        path = os.path.join(self._directory(symbol), 'manifest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, symbol, manifest):
+        path = os.path.join(self._directory(symbol), 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _append(self, directory, name, array, offset_rows):
+        """Append rows to a raw file after its first offset_rows rows
+
+        Only bytes past the manifest's rows (left by an interrupted append)
+        are dropped, and no reader maps those.
+        """
+        path = os.path.join(directory, name)
+        array = np.ascontiguousarray(array)
+        row_bytes = array.itemsize * (array.shape[1] if array.ndim > 1 else 1)
+        with open(path, 'ab') as f:
+            f.truncate(offset_rows * row_bytes)
+            f.write(array.tobytes())
+
+    def _replace(self, directory, name, array):
+        """Write a raw file under a temporary name and rename it into place"""
+        path = os.path.join(directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(path + '.tmp', path)
+
+    def _save_state(self, directory, state):
+        path = os.path.join(directory, 'state.pkl')
+        joblib.dump(state, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def materialize(self, symbol, series=None):
+        """Compute and persist every feature for a symbol from scratch"""
+        series = series or self.price_store.get(symbol)
+        directory = self._directory(series.symbol)
+        os.makedirs(directory, exist_ok=True)
+        data = series.to_frame()
+
+        indicators = self.indicator_fn(data)
+        values = np.column_stack([data['Close'].to_numpy()] + [
+            np.asarray(indicators.get(name, [np.nan] * len(data)), dtype=float) for name in INDICATOR_COLUMNS
+        ]).astype(FEATURE_DTYPE)
+        windows = normalized_windows(data['Close'].to_numpy(), self.definition['window_length'])
+
+        # New files replace the old ones; the manifest is published last
+        self._replace(directory, 'dates.i8', series.dates.astype('<i8'))
+        self._replace(directory, 'features.f8', values)
+        self._replace(directory, 'windows.f32', windows)
+
+        closes = data['Close'].to_numpy()
+        volumes = data['Volume'].to_numpy() if 'Volume' in data.columns else None
+        state = {
+            'indicators': IncrementalIndicators.from_history(closes, volumes),
+            'tail': closes[-(self.definition['window_length'] - 1):].tolist(),
+            'last_close': float(closes[-1])
+        }
+        self._save_state(directory, state)
+        return self._finish(series.symbol, len(data), len(windows), series.dates[0], series.dates[-1])
+
+    def _finish(self, symbol, rows, windows, first_date, last_date):
+        manifest = {
+            'symbol': symbol,
+            'version': self.version,
+            'definition': self.definition,
+            'columns': self.definition['columns'],
+            'window_length': self.definition['window_length'],
+            'rows': int(rows),
+            'windows': int(windows),
+            'first_date': str(np.datetime64(first_date, 'D')),
+            'last_date': str(np.datetime64(last_date, 'D'))
+        }
+        self._write_manifest(symbol, manifest)
+        return manifest
+
+    def append_bars(self, symbol, data):
+        """Append bars newer than the stored ones, updating indicators incrementally"""
+        manifest = self._read_manifest(symbol)
+        directory = self._directory(symbol)
+        state = joblib.load(os.path.join(directory, 'state.pkl'))
+
+        data = data[data.index > pd.Timestamp(manifest['last_date'])]
+        bars = frame_to_bars(data)
+        if not bars:
+            return manifest
+
+        rows = []
+        for bar in bars:
+            values = state['indicators'].update(bar)
+            rows.append([bar['close']] + [values.get(name) for name in INDICATOR_COLUMNS])
+        values = np.array(rows, dtype=FEATURE_DTYPE)
+
+        closes = np.array(state['tail'] + [bar['close'] for bar in bars])
+        windows = normalized_windows(closes, self.definition['window_length'])
+        dates = np.array([bar['date'] for bar in bars], dtype='datetime64[D]')
+
+        self._append(directory, 'dates.i8', dates.astype('<i8'), manifest['rows'])
+        self._append(directory, 'features.f8', values, manifest['rows'])
+        self._append(directory, 'windows.f32', windows, manifest['windows'])
+
+        state['tail'] = closes[-(self.definition['window_length'] - 1):].tolist()
+        state['last_close'] = float(closes[-1])
+        self._save_state(directory, state)
+        return self._finish(symbol, manifest['rows'] + len(bars), manifest['windows'] + len(windows),
+                            manifest['first_date'], dates[-1])
+
+    def update(self, symbol):
+        """Bring a symbol's features up to date with the price store and open them"""
+        series = self.price_store.get(symbol)
+        symbol = series.symbol
+        with self._symbol_lock(symbol):
+            manifest = self._read_manifest(symbol)
+            if manifest is None:
+                manifest = self.materialize(symbol, series)
+            else:
+                last = np.datetime64(manifest['last_date'], 'D')
+                position = int(np.searchsorted(series.dates, last))
+                state = joblib.load(os.path.join(self._directory(symbol), 'state.pkl'))
+                unchanged = (position < len(series.dates) and series.dates[position] == last
+                             and np.isclose(series.columns['Close'][position], state['last_close'])
+                             and manifest.get('first_date') == str(series.dates[0].astype('datetime64[D]')))
+                if not unchanged:
+                    # The stored history no longer matches the source (revised bars or a
+                    # moved start date, which changes every indicator's warm-up): rebuild
+                    manifest = self.materialize(symbol, series)
+                elif position + 1 < len(series.dates):
+                    manifest = self.append_bars(symbol, series.to_frame(position + 1))
+            return FeatureSet(self._directory(symbol), manifest)
+
+    def read(self, symbol):
+        """Open a symbol's stored features without refreshing them"""
+        symbol = normalize_symbol(symbol)
+        # Under the lock, so the manifest and the files it describes match
+        with self._symbol_lock(symbol):
+            manifest = self._read_manifest(symbol)
+            if manifest is None:
+                raise LookupError(f"No materialized features for {symbol}")
+            return FeatureSet(self._directory(symbol), manifest)
@@ -0,0 +1,154 @@
+"""
+Demand-driven technical indicators
+Each indicator is a node with its inputs and the number of earlier bars it
+needs (its warm-up). Evaluating a set of names only computes those nodes and
+their dependencies, each over the requested rows plus its warm-up, and
+shared sub-expressions such as EMA_12/EMA_26 (MACD) or SMA_20/Volatility_20
+(Bollinger Bands) are computed once per call.
+"""
+
+import math
+
+import numpy as np
+
+
+def _ema_warmup(span, tolerance=1e-6):
+    """Bars after which older values carry less than `tolerance` of an EMA's weight"""
+    alpha = 2.0 / (span + 1)
+    return int(math.ceil(math.log(tolerance) / math.log(1 - alpha)))
+
+
+def _rolling_mean(window):
+    return lambda series: series.rolling(window=window).mean()
+
+
+def _rolling_std(window):
+    return lambda series: series.rolling(window=window).std()
+
+
+def _ema(span):
+    return lambda series: series.ewm(span=span).mean()
+
+
+def _rsi(delta):
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+
+# name: (inputs, warm-up bars, function of the input series)
+# 'close' and 'volume' are the raw columns; everything else refers to another node.
+NODES = {
+    'MA_10_days': (['close'], 9, _rolling_mean(10)),
+    'MA_50_days': (['close'], 49, _rolling_mean(50)),
+    'MA_100_days': (['close'], 99, _rolling_mean(100)),
+    'SMA_20': (['close'], 19, _rolling_mean(20)),
+    'SMA_50': (['MA_50_days'], 0, lambda ma: ma),
+    'EMA_12': (['close'], _ema_warmup(12), _ema(12)),
+    'EMA_26': (['close'], _ema_warmup(26), _ema(26)),
+    'MACD': (['EMA_12', 'EMA_26'], 0, lambda ema12, ema26: ema12 - ema26),
+    'MACD_Signal': (['MACD'], _ema_warmup(9), _ema(9)),
+    'MACD_Histogram': (['MACD', 'MACD_Signal'], 0, lambda macd, signal: macd - signal),
+    'RSI': (['Price_Change'], 13, _rsi),
+    'BB_Upper': (['SMA_20', 'Volatility_20'], 0, lambda sma20, std20: sma20 + (std20 * 2)),
+    'BB_Lower': (['SMA_20', 'Volatility_20'], 0, lambda sma20, std20: sma20 - (std20 * 2)),
+    'BB_Middle': (['SMA_20'], 0, lambda sma20: sma20),
+    'BB_Width': (['BB_Upper', 'BB_Lower'], 0, lambda upper, lower: upper - lower),
+    'Volume_SMA': (['volume'], 19, _rolling_mean(20)),
+    'Volume': (['volume'], 0, lambda volume: volume),
+    'Volume_Ratio': (['volume', 'Volume_SMA'], 0, lambda volume, sma: volume / sma),
+    'Daily_Return': (['close'], 1, lambda close: close.pct_change()),
+    'Cumulative_Return': (['close'], 0, None),  # anchored to the first evaluated row, see evaluate()
+    'Price_Change': (['close'], 1, lambda close: close.diff()),
+    'Price_Change_Pct': (['Price_Change', 'close'], 1, lambda change, close: change / close.shift(1) * 100),
+    'Volatility_20': (['close'], 19, _rolling_std(20)),
+    'Volatility_50': (['close'], 49, _rolling_std(50)),
+}
+
+# Output order of calculate_technical_indicators()
+INDICATOR_NAMES = [
+    'MA_10_days', 'MA_50_days', 'MA_100_days', 'SMA_20', 'SMA_50', 'EMA_12', 'EMA_26',
+    'MACD', 'MACD_Signal', 'MACD_Histogram', 'RSI', 'BB_Upper', 'BB_Lower', 'BB_Middle',
+    'BB_Width', 'Volume_SMA', 'Volume', 'Volume_Ratio', 'Daily_Return', 'Cumulative_Return',
+    'Price_Change', 'Price_Change_Pct', 'Volatility_20', 'Volatility_50'
+]
+
+VOLUME_INDICATORS = {'Volume_SMA', 'Volume', 'Volume_Ratio'}
+
+
+def parse_indicator_names(value):
+    """Names from a comma separated list, raising ValueError for unknown ones"""
+    names = [name.strip() for name in value.split(',') if name.strip()] if isinstance(value, str) else list(value)
+    lookup = {name.lower(): name for name in INDICATOR_NAMES}
+    unknown = [name for name in names if name.lower() not in lookup]
+    if unknown:
+        raise ValueError(f"Unknown indicators: {', '.join(unknown)}. Available: {', '.join(INDICATOR_NAMES)}")
+    return list(dict.fromkeys(lookup[name.lower()] for name in names))
+
+
+def _warmups(names):
+    """Bars before the first requested row that each needed node (and raw column) must cover"""
+    needed = {}
+    pending = [(name, 0) for name in names]
+    while pending:
+        name, lookback = pending.pop()
+        if needed.get(name, -1) >= lookback:
+            continue
+        needed[name] = lookback
+        if name in NODES:
+            inputs, warmup, _ = NODES[name]
+            pending.extend((dependency, lookback + warmup) for dependency in inputs)
+    return needed
+
+
+def required_lookback(names=None):
+    """Bars needed before the first requested row to warm up the given indicators"""
+    needed = _warmups(INDICATOR_NAMES if names is None else names)
+    return max(needed.get('close', 0), needed.get('volume', 0))
+
+
+def _tail(series, rows):
+    return series.iloc[len(series) - rows:]
+
+
+def evaluate(data, names=None, start=0):
+    """Indicator columns for the rows of data from `start` on
+
+    Returns {name: float array}, each covering every row of data with NaN
+    before `start`. Volume indicators
+    are skipped when data has no Volume column, and Cumulative_Return is
+    measured from row `start`.
+    """
+    names = list(INDICATOR_NAMES if names is None else names)
+    if 'Close' not in data.columns:
+        return {}
+    if 'Volume' not in data.columns:
+        names = [name for name in names if name not in VOLUME_INDICATORS]
+
+    total = len(data)
+    start = min(start, total)
+    # Number of trailing rows each node is computed over
+    rows = {name: total - max(0, start - lookback) for name, lookback in _warmups(names).items()}
+    values = {}
+
+    def node(name):
+        if name not in values:
+            if name in ('close', 'volume'):
+                values[name] = _tail(data[name.capitalize()], rows[name])
+            elif name == 'Cumulative_Return':
+                close = _tail(node('close'), rows[name])
+                values[name] = (close / close.iloc[0]) - 1 if len(close) else close
+            else:
+                # Inputs are cut to this node's rows plus its warm-up, which is then dropped again
+                inputs, warmup, function = NODES[name]
+                span = min(total, rows[name] + warmup)
+                values[name] = _tail(function(*[_tail(node(dependency), span) for dependency in inputs]), rows[name])
+        return values[name]
+
+    indicators = {}
+    for name in sorted(names, key=INDICATOR_NAMES.index):
+        series = _tail(node(name), total - start)
+        column = np.full(total, np.nan)
+        column[start:] = series.to_numpy(dtype=float)
+        indicators[name] = column
+    return indicators
@@ -0,0 +1,256 @@
+"""
+Indexed price data store
+Keeps each symbol's OHLCV history as NumPy columns over a sorted date index so
+date ranges are located by binary search, and aggregates daily bars to weekly
+or monthly bars with vectorized group reductions (cached per interval).
+"""
+
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'VWAP', 'Turnover']
+
+INTERVALS = {
+    '1d': '1d', 'd': '1d', 'day': '1d', 'daily': '1d',
+    '1wk': '1wk', 'w': '1wk', 'week': '1wk', 'weekly': '1wk',
+    '1mo': '1mo', 'm': '1mo', 'month': '1mo', 'monthly': '1mo'
+}
+
+
+def normalize_symbol(symbol):
+    """Map user input like 'm&m' or 'reliance.ns' onto archive file names"""
+    symbol = symbol.strip().upper().replace('&', '')
+    if symbol.endswith('.NS'):
+        symbol = symbol[:-3]
+    return symbol
+
+
+def normalize_interval(interval):
+    """Map interval aliases onto '1d', '1wk' or '1mo'"""
+    key = (interval or '1d').strip().lower()
+    if key not in INTERVALS:
+        raise ValueError(f"Unsupported interval '{interval}'. Use 1d, 1wk or 1mo")
+    return INTERVALS[key]
+
+
+def read_price_csv(path):
+    """Read an archive or yfinance CSV into a DataFrame indexed by date
+
+    Handles the extra 'Ticker'/'Date' header rows newer yfinance versions
+    write for multi-index columns.
+    """
+    frame = pd.read_csv(path, index_col=0)
+    frame.index = pd.to_datetime(frame.index, errors='coerce')
+    frame = frame[frame.index.notna()]
+    frame.index.name = 'Date'
+    return frame[[column for column in frame.columns if column in OHLCV_COLUMNS]]
+
+
+def _to_day(value):
+    """Convert a date-like value to numpy datetime64[D]"""
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+class PriceSeries:
+    """Columnar OHLCV history of one symbol at one interval"""
+
+    def __init__(self, symbol, dates, columns, interval='1d'):
+        self.symbol = symbol
+        self.interval = interval
+        self.dates = dates
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, symbol, frame):
+        """Build a daily series from a DataFrame indexed by date"""
+        frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+        close = pd.to_numeric(frame['Close'], errors='coerce')
+        frame = frame[close.notna().to_numpy()]
+        dates = pd.DatetimeIndex(frame.index).values.astype('datetime64[D]')
+        columns = {}
+        for column in OHLCV_COLUMNS:
+            if column in frame.columns:
+                columns[column] = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+        return cls(symbol, dates, columns)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def locate(self, start=None, end=None):
+        """Binary search the [lo, hi) row range covering start..end (inclusive)"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, _to_day(start), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, _to_day(end), side='right'))
+        return lo, max(lo, hi)
+
+    def to_frame(self, lo=0, hi=None):
+        """Rows lo..hi as a DataFrame indexed by date"""
+        hi = len(self.dates) if hi is None else hi
+        return pd.DataFrame({name: values[lo:hi] for name, values in self.columns.items()},
+                            index=pd.DatetimeIndex(self.dates[lo:hi], name='Date'))
+
+    def resample(self, interval):
+        """Aggregate daily bars into weekly or monthly bars"""
+        if interval == '1d' or len(self.dates) == 0:
+            return self
+
+        if interval == '1wk':
+            # 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday
+            keys = (self.dates.astype(np.int64) + 3) // 7
+        else:
+            keys = self.dates.astype('datetime64[M]').astype(np.int64)
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+
+        columns = {}
+        source = self.columns
+        close = source['Close']
+        columns['Open'] = source.get('Open', close)[starts]
+        columns['High'] = np.fmax.reduceat(source.get('High', close), starts)
+        columns['Low'] = np.fmin.reduceat(source.get('Low', close), starts)
+        columns['Close'] = close[ends]
+
+        if 'Volume' in source:
+            volume = np.nan_to_num(source['Volume'])
+            total_volume = np.add.reduceat(volume, starts)
+            columns['Volume'] = total_volume
+
+            # Volume weighted average price: traded value over traded volume
+            if 'VWAP' in source:
+                price = source['VWAP']
+            else:
+                price = (source.get('High', close) + source.get('Low', close) + close) / 3
+            traded_value = np.add.reduceat(np.nan_to_num(price * volume), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns['VWAP'] = np.where(total_volume > 0, traded_value / total_volume, np.nan)
+
+        if 'Turnover' in source:
+            columns['Turnover'] = np.add.reduceat(np.nan_to_num(source['Turnover']), starts)
+
+        # Each bar is labelled with the last trading day it covers
+        return PriceSeries(self.symbol, self.dates[ends], columns, interval)
+
+
+class PriceStore:
+    """Lazily loaded, indexed price histories for NIFTY and the archive symbols
+
+    Archive CSVs and the <NAME>_yfinance.csv files written by
+    download_data.py (global indices, top stocks) are read once. Symbols backed by a loader function (such as
+    NIFTY via yfinance) are refreshed after `ttl` seconds. Resampled series
+    are cached per interval alongside the daily one.
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, data_dir=DATA_DIR):
+        self.archive_dir = archive_dir
+        self.data_dir = data_dir
+        self._loaders = {}
+        self._series = {}
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+
+    def add_loader(self, symbol, loader, ttl=None):
+        """Register a function returning a daily OHLCV DataFrame for a symbol"""
+        self._loaders[normalize_symbol(symbol)] = (loader, ttl)
+
+    def register(self, symbol, frame):
+        """Install (or replace) a symbol's daily history"""
+        symbol = normalize_symbol(symbol)
+        series = PriceSeries.from_frame(symbol, frame)
+        with self._lock:
+            for key in [key for key in self._series if key[0] == symbol]:
+                del self._series[key]
+            self._series[(symbol, '1d')] = series
+            self._loaded_at[symbol] = time.time()
+        return series
+
+    def symbols(self):
+        """All symbols the store can serve"""
+        files = []
+        if os.path.isdir(self.archive_dir):
+            files += [name[:-4] for name in os.listdir(self.archive_dir)
+                      if name.endswith('.csv') and name != 'stock_metadata.csv']
+        if os.path.isdir(self.data_dir):
+            files += [name[:-len('_yfinance.csv')] for name in os.listdir(self.data_dir)
+                      if name.endswith('_yfinance.csv')]
+        return sorted(set(files) | set(self._loaders) | {key[0] for key in self._series})
+
+    def archive_symbols(self):
+        """Symbols with a constituent CSV in data/archive"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.archive_dir)
+                      if name.endswith('.csv') and name != 'stock_metadata.csv')
+
+    def _csv_path(self, symbol):
+        """Archive CSV for the symbol, else a downloaded yfinance CSV"""
+        path = os.path.join(self.archive_dir, f'{symbol}.csv')
+        if not os.path.exists(path):
+            path = os.path.join(self.data_dir, f'{symbol}_yfinance.csv')
+        return path
+
+    def _load_daily(self, symbol):
+        if symbol in self._loaders:
+            loader, _ = self._loaders[symbol]
+            frame = loader()
+            if frame is None or frame.empty:
+                raise LookupError(f"No data available for {symbol}")
+            return self.register(symbol, frame)
+
+        path = self._csv_path(symbol)
+        if not re.fullmatch(r'[A-Z0-9_-]+', symbol) or not os.path.exists(path):
+            raise LookupError(f"Unknown symbol '{symbol}'")
+        return self.register(symbol, read_price_csv(path))
+
+    def _is_stale(self, symbol):
+        if symbol not in self._loaders:
+            return False
+        _, ttl = self._loaders[symbol]
+        return ttl is not None and time.time() - self._loaded_at.get(symbol, 0) > ttl
+
+    def get(self, symbol, interval='1d'):
+        """Daily or resampled PriceSeries for a symbol"""
+        symbol = normalize_symbol(symbol)
+        interval = normalize_interval(interval)
+
+        daily = self._series.get((symbol, '1d'))
+        if daily is None:
+            daily = self._load_daily(symbol)
+        elif self._is_stale(symbol):
+            try:
+                daily = self._load_daily(symbol)
+            except Exception as e:
+                # Keep serving the previous copy if a refresh fails
+                print(f"Error refreshing {symbol}: {e}")
+        if interval == '1d':
+            return daily
+
+        series = self._series.get((symbol, interval))
+        if series is None:
+            series = daily.resample(interval)
+            with self._lock:
+                # Only cache if the daily series wasn't replaced meanwhile
+                if self._series.get((symbol, '1d')) is daily:
+                    self._series[(symbol, interval)] = series
+        return series
+
+    def query(self, symbol, start=None, end=None, interval='1d', lookback=0, limit=None):
+        """Bars between start and end plus up to `lookback` earlier bars
+
+        Returns (frame, offset, first): the bars, the number of leading
+        lookback rows and the series position of the first row. Without a
+        start date only the last `limit` bars (plus lookback) are returned.
+        """
+        series = self.get(symbol, interval)
+        lo, hi = series.locate(start, end)
+        if start is None and limit:
+            lo = max(lo, hi - limit)
+        first = max(0, lo - lookback)
+        return series.to_frame(first, hi), lo - first, first
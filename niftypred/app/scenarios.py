@@ -0,0 +1,157 @@
+"""
+Monte Carlo price scenarios
+Simulates forward price paths with geometric Brownian motion or a block
+bootstrap of historical daily returns and summarises them as per-day
+quantile fans plus threshold probabilities. Paths are advanced a chunk of
+days at a time in log space, so memory is paths x chunk_days float32 no
+matter how long the horizon is; only each path's current, highest and
+lowest log price are carried between chunks.
+"""
+
+import numpy as np
+
+DEFAULT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def log_returns(closes):
+    """Daily log returns of a close price history (non-positive prices dropped)"""
+    closes = np.asarray(closes, dtype=float)
+    closes = closes[np.isfinite(closes) & (closes > 0)]
+    return np.diff(np.log(closes))
+
+
+def gbm_parameters(closes, volatility='returns', window=20, drift_window=250, drift=True):
+    """Daily log drift and volatility for GBM
+
+    volatility='returns' uses the standard deviation of the last `window`
+    daily returns; 'indicator' uses Volatility_20 / Close, the rolling price
+    standard deviation relative to the price. The drift is the mean log
+    return over `drift_window` days, or zero with drift=False.
+    """
+    closes = np.asarray(closes, dtype=float)
+    returns = log_returns(closes)
+    if len(returns) < window:
+        raise ValueError(f"Need at least {window + 1} prices to estimate volatility")
+
+    if volatility == 'returns':
+        sigma = float(np.std(returns[-window:], ddof=1))
+    elif volatility == 'indicator':
+        sigma = float(np.std(closes[-window:], ddof=1) / closes[-1])
+    else:
+        raise ValueError("volatility must be 'returns' or 'indicator'")
+
+    mu = float(np.mean(returns[-drift_window:])) if drift else 0.0
+    return mu, sigma
+
+
+def gbm_steps(mu, sigma):
+    """Step function drawing normal daily log returns as antithetic pairs
+
+    Every draw z is used for one path and -z for another, which halves the
+    random number generation and lowers the variance of the estimates.
+    """
+    shift = np.float32(mu)
+    scale = np.float32(sigma)
+
+    def step(rng, days, paths):
+        half = -(-paths // 2)
+        shocks = np.empty((days, 2 * half), dtype=np.float32)
+        draws = rng.standard_normal((days, half), dtype=np.float32)
+        shocks[:, :half] = draws
+        np.negative(draws, out=shocks[:, half:])
+        shocks = shocks[:, :paths]
+        shocks *= scale
+        shocks += shift
+        return shocks
+
+    return step
+
+
+def bootstrap_steps(returns, block=5):
+    """Step function resampling blocks of `block` consecutive historical log returns
+
+    Blocks keep short-range autocorrelation and volatility clustering that
+    independent draws would lose.
+    """
+    returns = np.asarray(returns, dtype=np.float32)
+    if len(returns) == 0:
+        raise ValueError('No historical returns to bootstrap')
+    block = max(1, min(block, len(returns)))
+    offsets = np.arange(block)[None, :, None]
+
+    def step(rng, days, paths):
+        blocks = -(-days // block)
+        starts = rng.integers(0, len(returns) - block + 1, size=(blocks, 1, paths))
+        sampled = returns[starts + offsets]
+        return sampled.reshape(blocks * block, paths)[:days]
+
+    step.block = block
+    return step
+
+
+def simulate(start_price, days, paths, step, quantiles=None, thresholds=None,
+             seed=None, chunk_days=25, max_chunk_values=4_000_000):
+    """Simulate paths and summarise them
+
+    Returns a dict of arrays: 'quantiles' (days x len(quantiles), linear
+    interpolation like np.quantile), 'mean' (days), and for each threshold
+    price 'prob_above_end', 'prob_below_end' and 'prob_touch' (the path
+    reaches it at some point in the horizon).
+    """
+    quantiles = np.asarray(quantiles if quantiles is not None else DEFAULT_QUANTILES, dtype=float)
+    thresholds = np.asarray(thresholds if thresholds is not None else [], dtype=float)
+    rng = np.random.default_rng(seed)
+
+    # Keep each chunk under max_chunk_values floats, in whole bootstrap blocks
+    chunk_days = max(1, min(chunk_days, days, max_chunk_values // max(paths, 1)))
+    block = getattr(step, 'block', 1)
+    chunk_days = max(block, chunk_days // block * block)
+
+    position = quantiles * (paths - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, paths - 1)
+    weight = position - lower
+
+    log_start = np.log(start_price)
+    current = np.zeros(paths, dtype=np.float32)  # log price relative to the start
+    highest = np.zeros(paths, dtype=np.float32)
+    lowest = np.zeros(paths, dtype=np.float32)
+
+    fan = np.empty((days, len(quantiles)))
+    mean = np.empty(days)
+    for first in range(0, days, chunk_days):
+        count = min(chunk_days, days - first)
+        levels = step(rng, count, paths)  # days x paths, each day contiguous
+
+        # Running sum day by day: each step is one contiguous vector add
+        levels[0] += current
+        for day in range(1, count):
+            np.add(levels[day - 1], levels[day], out=levels[day])
+
+        np.maximum(highest, levels.max(axis=0), out=highest)
+        np.minimum(lowest, levels.min(axis=0), out=lowest)
+        current = levels[-1].copy()
+
+        # Path identity is no longer needed: sort each day in place for the
+        # quantiles (order statistics, so log space is fine)
+        levels.sort(axis=1)
+        low = levels[:, lower].astype(float)
+        fan[first:first + count] = np.exp(log_start + low + (levels[:, upper] - low) * weight)
+        mean[first:first + count] = np.exp(levels, out=levels).mean(axis=1, dtype=float) * start_price
+
+    log_thresholds = np.log(thresholds) - log_start if len(thresholds) else thresholds
+    final = np.sort(current)
+    above = (paths - np.searchsorted(final, log_thresholds, side='left')) / paths
+    below = np.searchsorted(final, log_thresholds, side='right') / paths
+    # Thresholds above the start are touched by the running high, the others by the running low
+    touch = np.where(log_thresholds >= 0,
+                     (paths - np.searchsorted(np.sort(highest), log_thresholds, side='left')) / paths,
+                     np.searchsorted(np.sort(lowest), log_thresholds, side='right') / paths)
+
+    return {
+        'quantiles': fan,
+        'mean': mean,
+        'prob_above_end': above,
+        'prob_below_end': below,
+        'prob_touch': touch
+    }
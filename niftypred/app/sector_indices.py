@@ -0,0 +1,346 @@
+"""
+Sector and basket indices
+Builds chain-linked indices from archive constituents: one per Industry in
+stock_metadata.csv plus user-defined baskets, equal- or turnover-weighted.
+Each index is computed over the aligned dates x symbols panel in one
+vectorized pass, persisted as a CSV with a JSON manifest, and extended
+incrementally when constituents get new bars. Indices are registered in the
+price store so they are served like any other symbol.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from price_store import ARCHIVE_DIR, DATA_DIR, normalize_symbol, read_price_csv
+
+INDICES_DIR = os.path.join(DATA_DIR, 'indices')
+METADATA_PATH = os.path.join(ARCHIVE_DIR, 'stock_metadata.csv')
+
+WEIGHTINGS = ('equal', 'turnover')
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close']
+BASE_LEVEL = 1000.0
+
+
+def index_name(prefix, label):
+    """Symbol for an index, e.g. ('SECTOR', 'Financial Services') -> SECTOR_FINANCIAL_SERVICES"""
+    return f"{prefix}_{re.sub(r'[^A-Z0-9]+', '_', label.upper()).strip('_')}"
+
+
+def load_sectors(path=METADATA_PATH):
+    """{sector index name: {'industry', 'members'}} from stock_metadata.csv"""
+    if not os.path.exists(path):
+        return {}
+    metadata = pd.read_csv(path)
+    sectors = {}
+    for industry, rows in metadata.groupby('Industry'):
+        members = sorted({normalize_symbol(symbol) for symbol in rows['Symbol']})
+        sectors[index_name('SECTOR', industry)] = {'industry': industry, 'members': members}
+    return sectors
+
+
+def align_panel(series, start=None):
+    """{field: DataFrame (dates x symbols)} over the union of the members' dates"""
+    panel = {}
+    for field in PRICE_FIELDS + ['Volume', 'Turnover']:
+        columns = {}
+        for symbol, s in series.items():
+            lo = s.locate(start)[0]
+            values = s.columns.get(field, s.columns['Close'] if field in PRICE_FIELDS else None)
+            if values is not None:
+                columns[symbol] = pd.Series(values[lo:], index=s.dates[lo:])
+        panel[field] = pd.concat(columns, axis=1).sort_index() if columns else pd.DataFrame()
+    index = panel['Close'].index
+    return {field: frame.reindex(index=index, columns=list(series)) for field, frame in panel.items()}
+
+
+def chain_link(panel, weighting='turnover', window=20, max_fill=5, max_move=0.4):
+    """Index bars on a base of 1 from an aligned panel
+
+    Each day's index return is the weighted mean of the members' returns
+    against their previous close (carried over up to max_fill missing days).
+    Weights use only information from before the day: equal over members
+    with a return, or their mean turnover over the previous `window` days.
+    Single-day moves beyond max_move are taken to be unadjusted splits or
+    bonuses and left out. Open/High/Low are the same weighted mean of each
+    member's open/high/low relative to its previous close.
+    """
+    previous = panel['Close'].ffill(limit=max_fill).shift(1).to_numpy(dtype=float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moves = {field: panel[field].to_numpy(dtype=float) / previous - 1 for field in PRICE_FIELDS}
+    present = np.isfinite(moves['Close']) & (np.abs(moves['Close']) <= max_move)
+
+    if weighting == 'turnover':
+        turnover = panel['Turnover'].rolling(window, min_periods=1).mean().shift(1).to_numpy(dtype=float)
+        raw = np.where(present & np.isfinite(turnover) & (turnover > 0), turnover, 0.0)
+    elif weighting == 'equal':
+        raw = present.astype(float)
+    else:
+        raise ValueError(f"weighting must be one of {', '.join(WEIGHTINGS)}")
+    total = raw.sum(axis=1, keepdims=True)
+    weights = np.divide(raw, total, out=np.zeros_like(raw), where=total > 0)
+
+    # Weighted mean move per day; days without members leave the index unchanged
+    returns = {field: (weights * np.nan_to_num(np.where(present, moves[field], 0.0))).sum(axis=1)
+               for field in PRICE_FIELDS}
+    level = np.cumprod(1 + returns['Close'])
+    before = np.r_[1.0, level[:-1]]
+
+    bars = pd.DataFrame({
+        'Open': before * (1 + returns['Open']),
+        'High': before * (1 + returns['High']),
+        'Low': before * (1 + returns['Low']),
+        'Close': level,
+        'Volume': np.nansum(panel['Volume'].to_numpy(dtype=float), axis=1),
+        'Turnover': np.nansum(panel['Turnover'].to_numpy(dtype=float), axis=1),
+        'Members': present.sum(axis=1)
+    }, index=pd.DatetimeIndex(panel['Close'].index, name='Date'))
+    bars['High'] = bars[['High', 'Open', 'Close']].max(axis=1)
+    bars['Low'] = bars[['Low', 'Open', 'Close']].min(axis=1)
+    return bars
+
+
+class IndexEngine:
+    """Builds, persists and incrementally updates sector and basket indices
+
+    Baskets are stored in baskets.json next to the index files. An index is
+    rebuilt from scratch when its definition changes or a member's history
+    no longer matches what was used, and otherwise only new dates are
+    computed (over a short tail of earlier rows for previous closes and
+    turnover weights). New dates start after the index's last date, or
+    after a lagging member's last date once that member catches up, so bars
+    first linked without it are recomputed.
+    """
+
+    def __init__(self, price_store, root=INDICES_DIR, metadata_path=METADATA_PATH,
+                 weighting='turnover', window=20, max_fill=5, max_move=0.4):
+        self.price_store = price_store
+        self.root = root
+        self.metadata_path = metadata_path
+        self.weighting = weighting
+        self.window = window
+        self.max_fill = max_fill
+        self.max_move = max_move
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _symbol_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    # Definitions
+
+    def _baskets_path(self):
+        return os.path.join(self.root, 'baskets.json')
+
+    def baskets(self):
+        path = self._baskets_path()
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def definitions(self):
+        """{name: definition} for every sector and basket index"""
+        definitions = {}
+        for name, sector in load_sectors(self.metadata_path).items():
+            definitions[name] = {'kind': 'sector', 'industry': sector['industry'],
+                                 'members': sector['members'], 'weighting': self.weighting}
+        for name, basket in self.baskets().items():
+            definitions[name] = {'kind': 'basket', 'members': basket['members'], 'weighting': basket['weighting']}
+        return definitions
+
+    def save_basket(self, label, members, weighting='equal'):
+        """Create or replace a basket index and return its name"""
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"weighting must be one of {', '.join(WEIGHTINGS)}")
+        members = sorted({normalize_symbol(symbol) for symbol in members})
+        if not members:
+            raise ValueError('A basket needs at least one member')
+        for symbol in members:
+            self.price_store.get(symbol)  # LookupError for unknown symbols
+
+        name = index_name('BASKET', label)
+        with self._lock:
+            baskets = self.baskets()
+            baskets[name] = {'members': members, 'weighting': weighting}
+            os.makedirs(self.root, exist_ok=True)
+            with open(self._baskets_path() + '.tmp', 'w') as f:
+                json.dump(baskets, f, indent=2)
+            os.replace(self._baskets_path() + '.tmp', self._baskets_path())
+        return name
+
+    def _version(self, definition):
+        settings = {'members': definition['members'], 'weighting': definition['weighting'],
+                    'window': self.window, 'max_fill': self.max_fill, 'max_move': self.max_move,
+                    'checks': 'member_last_date'}
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+    # Storage
+
+    def _paths(self, name):
+        return os.path.join(self.root, f'{name}.csv'), os.path.join(self.root, f'{name}.json')
+
+    def _read_manifest(self, name):
+        path = self._paths(name)[1]
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, name, manifest):
+        path = self._paths(name)[1]
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _manifest(self, definition, version, bars, series):
+        last = bars.index[-1]
+        day = np.datetime64(last.date(), 'D')
+        # Each member's last bar up to the last date, to notice later history
+        # changes and members that were behind the others
+        checks = {}
+        for symbol, s in series.items():
+            position = int(np.searchsorted(s.dates, day, side='right')) - 1
+            if position >= 0:
+                checks[symbol] = {'date': str(s.dates[position]), 'close': float(s.columns['Close'][position])}
+        return {'version': version, 'definition': definition, 'rows': int(len(bars)),
+                'last_date': last.strftime('%Y-%m-%d'), 'last_close': float(bars['Close'].iloc[-1]),
+                'checks': checks}
+
+    def _unchanged(self, manifest, series):
+        day = np.datetime64(manifest['last_date'], 'D')
+        for symbol, s in series.items():
+            check = manifest['checks'].get(symbol)
+            if check is None:
+                # A member without bars at the last build must still have none
+                if len(s.dates) and s.dates[0] <= day:
+                    return False
+                continue
+            check_day = np.datetime64(check['date'], 'D')
+            position = int(np.searchsorted(s.dates, check_day))
+            if (position >= len(s.dates) or s.dates[position] != check_day
+                    or not np.isclose(s.columns['Close'][position], check['close'])):
+                return False
+        return all(symbol in series for symbol in manifest['checks'])
+
+    def _resume_date(self, manifest, series):
+        """Date after which bars must be (re)computed
+
+        The index's last date, or earlier if a member that was behind now has
+        bars on dates the index already covers.
+        """
+        last = np.datetime64(manifest['last_date'], 'D')
+        resume = last
+        for symbol, s in series.items():
+            check_day = np.datetime64(manifest['checks'][symbol]['date'], 'D') if symbol in manifest['checks'] else None
+            if check_day is not None and check_day < last:
+                position = int(np.searchsorted(s.dates, check_day, side='right'))
+                if position < len(s.dates) and s.dates[position] <= last:
+                    resume = min(resume, check_day)
+        return pd.Timestamp(resume)
+
+    def _members(self, definition):
+        series = {}
+        for symbol in definition['members']:
+            try:
+                series[symbol] = self.price_store.get(symbol)
+            except Exception as e:
+                print(f"Skipping {symbol} in index: {e}")
+        if not series:
+            raise LookupError('No constituent data for this index')
+        return series
+
+    def build(self, name, definition, series):
+        """Compute an index over the members' full history and persist it"""
+        bars = chain_link(align_panel(series), definition['weighting'], self.window, self.max_fill, self.max_move)
+        bars = bars[bars['Members'].cumsum() > 0]  # start once a member has a return
+        bars[PRICE_FIELDS] *= BASE_LEVEL
+        os.makedirs(self.root, exist_ok=True)
+        csv_path = self._paths(name)[0]
+        bars.to_csv(csv_path + '.tmp')
+        os.replace(csv_path + '.tmp', csv_path)
+        self._write_manifest(name, self._manifest(definition, self._version(definition), bars, series))
+        return bars
+
+    def append(self, name, definition, manifest, series):
+        """Compute bars after the resume date and append (or splice) them"""
+        last = pd.Timestamp(manifest['last_date'])
+        resume = self._resume_date(manifest, series)
+        if resume == last and all(s.dates[-1] <= np.datetime64(last.date(), 'D') for s in series.values()):
+            return None
+
+        # Enough earlier rows for carried-over closes and the turnover window
+        context = self.window + self.max_fill + 1
+        starts = []
+        for s in series.values():
+            position = s.locate(resume)[0]
+            starts.append(s.dates[max(0, position - context)])
+        panel = align_panel(series, start=pd.Timestamp(min(starts)))
+
+        bars = chain_link(panel, definition['weighting'], self.window, self.max_fill, self.max_move)
+        csv_path = self._paths(name)[0]
+        if resume == last:
+            anchor, stored = manifest['last_close'], None
+        else:
+            stored = pd.read_csv(csv_path, index_col='Date', parse_dates=['Date'])
+            stored = stored[stored.index <= resume]
+            anchor = stored['Close'].iloc[-1]
+        scale = anchor / bars['Close'].loc[:resume].iloc[-1]
+        bars = bars[bars.index > resume]
+        bars[PRICE_FIELDS] *= scale
+
+        if stored is None:
+            bars.to_csv(csv_path, mode='a', header=False)
+            rows = manifest['rows'] + len(bars)
+        else:
+            # Bars after the lagging member's last date are replaced
+            combined = pd.concat([stored, bars])
+            combined.to_csv(csv_path + '.tmp')
+            os.replace(csv_path + '.tmp', csv_path)
+            bars, rows = combined, len(combined)
+
+        updated = self._manifest(definition, manifest['version'], bars, series)
+        updated['rows'] = rows
+        self._write_manifest(name, updated)
+        return bars
+
+    def update(self, name):
+        """Bring an index up to date and return its full daily history"""
+        name = normalize_symbol(name)
+        definition = self.definitions().get(name)
+        if definition is None:
+            raise LookupError(f"Unknown index '{name}'")
+
+        with self._symbol_lock(name):
+            series = self._members(definition)
+            manifest = self._read_manifest(name)
+            version = self._version(definition)
+            if manifest is None or manifest['version'] != version or not self._unchanged(manifest, series):
+                self.build(name, definition, series)
+            else:
+                self.append(name, definition, manifest, series)
+            return read_price_csv(self._paths(name)[0])
+
+    def register(self, ttl=None):
+        """Serve every index through the price store"""
+        for name in self.definitions():
+            self.register_index(name, ttl)
+
+    def register_index(self, name, ttl=None):
+        self.price_store.add_loader(name, lambda name=name: self.update(name), ttl)
+
+    def summary(self):
+        """Definitions with the stored state of each index"""
+        summary = []
+        for name, definition in self.definitions().items():
+            manifest = self._read_manifest(name) or {}
+            summary.append(dict(definition, symbol=name, rows=manifest.get('rows'),
+                                last_date=manifest.get('last_date'), last_close=manifest.get('last_close')))
+        return summary
@@ -0,0 +1,64 @@
+"""
+Single-flight call de-duplication
+Concurrent calls with the same key share one execution: the first caller
+runs the function and everyone who arrives while it is running waits for it
+and receives the same result (or the same exception). Nothing is cached
+after the call finishes, so the next call runs again.
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Groups concurrent calls by key
+
+    Callers receive the very same result object, so they must treat it as
+    read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'executions': 0, 'shared': 0}
+
+    def do(self, key, function, *args, **kwargs):
+        """Run function(*args, **kwargs) unless a call with this key is already running"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['shared'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = function(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self):
+        """Keys currently running and how many extra callers wait on each"""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
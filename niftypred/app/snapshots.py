@@ -0,0 +1,172 @@
+"""
+End-of-day precomputed snapshots
+Forecasts and indicators only change once per trading day, so a scheduler
+precomputes the API payloads after the daily bar lands and publishes them
+as one immutable snapshot. Publishing swaps a single reference, so request
+handlers read the current snapshot without locking.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import joblib
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'snapshots', 'current.pkl')
+
+
+class Snapshot:
+    """Immutable set of precomputed payloads plus their pre-encoded JSON bodies"""
+
+    def __init__(self, entries, stamp, encode=json.dumps, snapshot_id=None, created_at=None):
+        self.id = snapshot_id or uuid.uuid4().hex[:12]
+        self.created_at = created_at or time.time()
+        self.stamp = stamp
+        self.entries = MappingProxyType(dict(entries))
+        self.bodies = MappingProxyType({key: encode(payload) for key, payload in entries.items()})
+
+    def __getstate__(self):
+        return {'id': self.id, 'created_at': self.created_at, 'stamp': self.stamp,
+                'entries': dict(self.entries), 'bodies': dict(self.bodies)}
+
+    def __setstate__(self, state):
+        self.id = state['id']
+        self.created_at = state['created_at']
+        self.stamp = state['stamp']
+        self.entries = MappingProxyType(state['entries'])
+        self.bodies = MappingProxyType(state['bodies'])
+
+
+class SnapshotStore:
+    """Holds the current snapshot and persists it so restarts can serve it straight away
+
+    A snapshot is only served while its stamp (e.g. model file versions)
+    matches the current one and it is younger than `max_age` seconds.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, max_age=30 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.current = None
+
+    def publish(self, entries, stamp, encode=json.dumps):
+        snapshot = Snapshot(entries, stamp, encode)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            joblib.dump(snapshot, self.path + '.tmp')
+            os.replace(self.path + '.tmp', self.path)
+        except Exception as e:
+            print(f"Error persisting snapshot: {e}")
+        self.current = snapshot
+        return snapshot
+
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                self.current = joblib.load(self.path)
+        except Exception as e:
+            print(f"Error loading snapshot: {e}")
+        return self.current
+
+    def lookup(self, key, stamp):
+        """(snapshot, payload, body) for a key, or None on a miss"""
+        snapshot = self.current
+        if snapshot is None or snapshot.stamp != stamp:
+            return None
+        if time.time() - snapshot.created_at > self.max_age:
+            return None
+        if key not in snapshot.entries:
+            return None
+        return snapshot, snapshot.entries[key], snapshot.bodies[key]
+
+
+class PrecomputeScheduler:
+    """Runs `build` once per weekday at `run_at` (HH:MM) and publishes the result
+
+    trigger() starts a run immediately in the background; only one run
+    happens at a time.
+    """
+
+    def __init__(self, build, store, stamp, run_at='16:00', timezone=None, encode=json.dumps):
+        self.build = build
+        self.store = store
+        self.stamp = stamp
+        self.run_at = datetime.strptime(run_at, '%H:%M').time()
+        self.timezone = self._zone(timezone)
+        self.encode = encode
+        self.status = {'running': False, 'last_run': None, 'last_duration': None,
+                       'last_error': None, 'snapshot_id': None, 'entries': 0}
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _zone(name):
+        if not name or ZoneInfo is None:
+            return None
+        try:
+            return ZoneInfo(name)
+        except Exception as e:
+            print(f"Unknown timezone {name}, using local time: {e}")
+            return None
+
+    def next_run(self, now=None):
+        """Next weekday at run_at after now"""
+        now = now or datetime.now(self.timezone)
+        candidate = now.replace(hour=self.run_at.hour, minute=self.run_at.minute, second=0, microsecond=0)
+        if candidate <= now:
+            candidate += timedelta(days=1)
+        while candidate.weekday() >= 5:
+            candidate += timedelta(days=1)
+        return candidate
+
+    def run(self):
+        """Build and publish a snapshot now (skipped if a run is already going)"""
+        if not self._run_lock.acquire(blocking=False):
+            return False
+        started = time.time()
+        self.status['running'] = True
+        try:
+            stamp = self.stamp()
+            snapshot = self.store.publish(self.build(), stamp, self.encode)
+            self.status.update(snapshot_id=snapshot.id, entries=len(snapshot.entries), last_error=None)
+            print(f"Published snapshot {snapshot.id} with {len(snapshot.entries)} entries")
+            return True
+        except Exception as e:
+            self.status['last_error'] = str(e)
+            print(f"Precompute failed: {e}")
+            return False
+        finally:
+            self.status.update(running=False, last_run=datetime.now().isoformat(timespec='seconds'),
+                               last_duration=round(time.time() - started, 3))
+            self._run_lock.release()
+
+    def trigger(self):
+        """Run in the background right away"""
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def _loop(self):
+        while True:
+            now = datetime.now(self.timezone)
+            wait = (self.next_run(now) - now).total_seconds()
+            self.status['next_run'] = self.next_run(now).isoformat(timespec='minutes')
+            if self._stop.wait(wait):
+                return
+            self.run()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
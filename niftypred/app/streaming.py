@@ -0,0 +1,432 @@
+"""
+Server-sent event streaming of bar updates
+A single shared producer reads bars from a source, updates the technical
+indicators incrementally and fans each event out to every subscribed client.
+"""
+
+import json
+import math
+import os
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'archive')
+
+
+def _clean(value):
+    """Convert a float to a JSON friendly value (NaN/inf become None)"""
+    if value is None:
+        return None
+    value = float(value)
+    if math.isnan(value) or math.isinf(value):
+        return None
+    return value
+
+
+def frame_to_bars(data):
+    """Convert an OHLCV DataFrame indexed by date into a list of bar dicts"""
+    bars = []
+    close = data['Close']
+    opens = data['Open'] if 'Open' in data.columns else close
+    highs = data['High'] if 'High' in data.columns else close
+    lows = data['Low'] if 'Low' in data.columns else close
+    volumes = data['Volume'] if 'Volume' in data.columns else None
+
+    for i, date in enumerate(data.index):
+        if pd.isna(close.iloc[i]):
+            continue
+        bars.append({
+            'date': date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date),
+            'open': _clean(opens.iloc[i]),
+            'high': _clean(highs.iloc[i]),
+            'low': _clean(lows.iloc[i]),
+            'close': _clean(close.iloc[i]),
+            'volume': _clean(volumes.iloc[i]) if volumes is not None else None
+        })
+    return bars
+
+
+class _RollingWindow:
+    """Fixed size window matching pandas rolling(window=size)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+
+    def push(self, value):
+        self.values.append(value)
+
+    def mean(self):
+        if len(self.values) < self.size:
+            return None
+        return math.fsum(self.values) / self.size
+
+    def std(self):
+        if len(self.values) < self.size:
+            return None
+        return float(np.std(np.fromiter(self.values, dtype=float), ddof=1))
+
+
+class _ExponentialMean:
+    """Running equivalent of pandas ewm(span=span).mean() (adjust=True)"""
+
+    def __init__(self, span):
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+
+    def push(self, value):
+        self.weighted_sum = self.weighted_sum * self.decay + value
+        self.weight = self.weight * self.decay + 1.0
+        return self.weighted_sum / self.weight
+
+    def seed(self, mean, count):
+        """Restore the state reached after `count` values ending at `mean`"""
+        self.weight = (1.0 - self.decay ** count) / (1.0 - self.decay)
+        self.weighted_sum = mean * self.weight
+
+
+class IncrementalIndicators:
+    """Incremental version of calculate_technical_indicators()
+
+    Each call to update() consumes one bar and returns the indicator values
+    for that bar, producing the same numbers as the full recomputation.
+    """
+
+    def __init__(self):
+        self.ma = {days: _RollingWindow(days) for days in (10, 50, 100)}
+        self.window20 = _RollingWindow(20)
+        self.window50 = _RollingWindow(50)
+        self.volume20 = _RollingWindow(20)
+        self.gains = _RollingWindow(14)
+        self.losses = _RollingWindow(14)
+        self.ema12 = _ExponentialMean(12)
+        self.ema26 = _ExponentialMean(26)
+        self.macd_signal = _ExponentialMean(9)
+        self.first_close = None
+        self.prev_close = None
+
+    @classmethod
+    def from_history(cls, closes, volumes=None):
+        """State reached after update() on every bar, computed with vectorized ops"""
+        state = cls()
+        closes = np.asarray(closes, dtype=float)
+        if len(closes) == 0:
+            return state
+
+        for window in [*state.ma.values(), state.window20, state.window50]:
+            window.values.extend(closes[-window.size:].tolist())
+        if volumes is not None:
+            state.volume20.values.extend(np.asarray(volumes, dtype=float)[-20:].tolist())
+
+        delta = np.diff(closes, prepend=closes[0])
+        state.gains.values.extend(np.where(delta > 0, delta, 0.0)[-14:].tolist())
+        state.losses.values.extend(np.where(delta < 0, -delta, 0.0)[-14:].tolist())
+
+        close = pd.Series(closes)
+        ema12 = close.ewm(span=12).mean()
+        ema26 = close.ewm(span=26).mean()
+        macd = ema12 - ema26
+        state.ema12.seed(ema12.iloc[-1], len(closes))
+        state.ema26.seed(ema26.iloc[-1], len(closes))
+        state.macd_signal.seed(macd.ewm(span=9).mean().iloc[-1], len(closes))
+
+        state.first_close = float(closes[0])
+        state.prev_close = float(closes[-1])
+        return state
+
+    def update(self, bar):
+        """Consume one bar and return the indicator values for it"""
+        close = bar['close']
+        volume = bar.get('volume')
+        indicators = {}
+
+        for days, window in self.ma.items():
+            window.push(close)
+            indicators[f"MA_{days}_days"] = window.mean()
+
+        self.window20.push(close)
+        self.window50.push(close)
+        sma20 = self.window20.mean()
+        std20 = self.window20.std()
+        indicators['SMA_20'] = sma20
+        indicators['SMA_50'] = self.window50.mean()
+
+        ema12 = self.ema12.push(close)
+        ema26 = self.ema26.push(close)
+        macd = ema12 - ema26
+        signal = self.macd_signal.push(macd)
+        indicators['EMA_12'] = ema12
+        indicators['EMA_26'] = ema26
+        indicators['MACD'] = macd
+        indicators['MACD_Signal'] = signal
+        indicators['MACD_Histogram'] = macd - signal
+
+        # RSI (the first bar has no delta and counts as zero gain/loss)
+        delta = close - self.prev_close if self.prev_close is not None else 0.0
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        gain = self.gains.mean()
+        loss = self.losses.mean()
+        if gain is None:
+            indicators['RSI'] = None
+        elif loss == 0:
+            indicators['RSI'] = 100.0 if gain > 0 else None
+        else:
+            indicators['RSI'] = 100 - (100 / (1 + gain / loss))
+
+        # Bollinger Bands
+        if sma20 is not None:
+            indicators['BB_Upper'] = sma20 + std20 * 2
+            indicators['BB_Lower'] = sma20 - std20 * 2
+            indicators['BB_Width'] = std20 * 4
+        else:
+            indicators['BB_Upper'] = indicators['BB_Lower'] = indicators['BB_Width'] = None
+        indicators['BB_Middle'] = sma20
+
+        # Volume indicators
+        if volume is not None:
+            self.volume20.push(volume)
+            volume_sma = self.volume20.mean()
+            indicators['Volume_SMA'] = volume_sma
+            indicators['Volume'] = volume
+            indicators['Volume_Ratio'] = volume / volume_sma if volume_sma else None
+
+        # Returns
+        if self.first_close is None:
+            self.first_close = close
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            indicators['Daily_Return'] = change / self.prev_close
+            indicators['Price_Change'] = change
+            indicators['Price_Change_Pct'] = change / self.prev_close * 100
+        else:
+            indicators['Daily_Return'] = indicators['Price_Change'] = indicators['Price_Change_Pct'] = None
+        indicators['Cumulative_Return'] = close / self.first_close - 1
+
+        # Volatility
+        indicators['Volatility_20'] = std20
+        indicators['Volatility_50'] = self.window50.std()
+
+        self.prev_close = close
+        return {name: _clean(value) for name, value in indicators.items()}
+
+
+class CSVReplaySource:
+    """Replays an archive CSV at a configurable speed in place of a live feed"""
+
+    def __init__(self, path, speed=1.0, start=None, warmup=250, loop=False):
+        # Without a delay the replay outruns every subscriber queue and drops the clients
+        if not speed > 0:
+            raise ValueError(f"Replay speed must be positive, got {speed}")
+        self.path = path
+        self.speed = speed
+        self.start = start
+        self.warmup = warmup
+        self.loop = loop
+        self._bars = None
+        self._start_index = 0
+
+    def _load(self):
+        if self._bars is not None:
+            return
+        data = pd.read_csv(self.path, parse_dates=['Date']).set_index('Date').sort_index()
+        self._bars = frame_to_bars(data)
+        if self.start:
+            start = pd.to_datetime(self.start).strftime('%Y-%m-%d')
+            self._start_index = next(
+                (i for i, bar in enumerate(self._bars) if bar['date'] >= start), len(self._bars))
+        else:
+            self._start_index = min(self.warmup, len(self._bars))
+
+    def history(self):
+        """Bars before the replay start, used to seed indicator state"""
+        self._load()
+        return self._bars[max(0, self._start_index - self.warmup):self._start_index]
+
+    def bars(self, stop_event):
+        """Yield the remaining bars, pausing 1/speed seconds between them"""
+        self._load()
+        delay = 1.0 / self.speed
+        while True:
+            for bar in self._bars[self._start_index:]:
+                if stop_event.wait(delay):
+                    return
+                yield bar
+            if not self.loop:
+                return
+
+
+class PollingSource:
+    """Polls a fetch function (e.g. fetch_nifty_data) and emits bars not seen before"""
+
+    def __init__(self, fetch, interval=300):
+        self.fetch = fetch
+        self.interval = interval
+        self.last_date = None
+
+    def history(self):
+        data = self.fetch()
+        if data is None or data.empty:
+            return []
+        bars = frame_to_bars(data)
+        if bars:
+            self.last_date = bars[-1]['date']
+        return bars
+
+    def bars(self, stop_event):
+        while not stop_event.wait(self.interval):
+            data = self.fetch()
+            if data is None or data.empty:
+                continue
+            for bar in frame_to_bars(data):
+                if self.last_date is None or bar['date'] > self.last_date:
+                    self.last_date = bar['date']
+                    yield bar
+
+
+def format_sse(data, event=None, event_id=None):
+    """Format a payload as a server-sent event message"""
+    message = ''
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    if event:
+        message += f"event: {event}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+class _Generation:
+    """One run of the producer thread and the subscribers it serves"""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.subscribers = set()
+        self.event_id = 0
+        self.thread = None
+        self.done = False
+
+
+class BarBroadcaster:
+    """Single shared producer fanning bar events out to subscriber queues
+
+    The producer thread starts with the first subscriber and stops when the
+    last one leaves, so idle servers don't poll or replay anything. Each run
+    of the thread only publishes to its own subscribers, so a client that
+    arrives while a stopping run winds down is never sent its last events.
+    """
+
+    def __init__(self, source_factory, forecaster=None, forecast_days=0,
+                 history_size=500, max_queue=100, keepalive=15):
+        self.source_factory = source_factory
+        self.forecaster = forecaster
+        self.forecast_days = forecast_days
+        self.history_size = history_size
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._generation = None
+        self._owners = {}  # subscriber -> generation
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            generation = self._generation
+            if generation is None or generation.done or generation.stop.is_set():
+                generation = self._generation = _Generation()
+                generation.thread = threading.Thread(target=self._run, args=(generation,), daemon=True)
+                generation.thread.start()
+            generation.subscribers.add(subscriber)
+            self._owners[subscriber] = generation
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            generation = self._owners.pop(subscriber, None)
+            if generation is None:
+                return
+            generation.subscribers.discard(subscriber)
+            if not generation.subscribers:
+                generation.stop.set()
+
+    def _publish(self, generation, event, final=False):
+        with self._lock:
+            # Marked done together with its last event, so nobody joins a run that won't send more
+            generation.done = generation.done or final
+            # A stopped run has nobody left to serve
+            subscribers = [] if generation.stop.is_set() else list(generation.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop it rather than stall every other subscriber
+                self.unsubscribe(subscriber)
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'id': event.get('id'), 'error': 'Client too slow, disconnected'})
+
+    def _run(self, generation):
+        try:
+            source = self.source_factory()
+            indicators = IncrementalIndicators()
+            closes = deque(maxlen=self.history_size)
+            for bar in source.history():
+                indicators.update(bar)
+                closes.append(bar['close'])
+
+            for bar in source.bars(generation.stop):
+                generation.event_id += 1
+                closes.append(bar['close'])
+                event = {'id': generation.event_id, 'bar': bar, 'indicators': indicators.update(bar)}
+                if self.forecaster is not None and self.forecast_days > 0:
+                    try:
+                        event['forecast'] = self.forecaster(np.array(closes), bar['date'], self.forecast_days)
+                    except Exception as e:
+                        event['forecast_error'] = str(e)
+                self._publish(generation, event)
+            self._publish(generation, {'id': generation.event_id, 'end': True}, final=True)
+        except Exception as e:
+            print(f"Stream producer error: {e}")
+            self._publish(generation, {'id': generation.event_id, 'error': str(e)}, final=True)
+
+    def events(self, subscriber, include_forecast=True):
+        """Generator of SSE messages for one subscriber"""
+        try:
+            yield ': connected\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if 'error' in event:
+                    yield format_sse({'message': event['error']}, event='error', event_id=event['id'])
+                    return
+                if event.get('end'):
+                    yield format_sse({'message': 'Stream ended'}, event='end', event_id=event['id'])
+                    return
+                payload = {'bar': event['bar'], 'indicators': event['indicators']}
+                if include_forecast:
+                    for key in ('forecast', 'forecast_error'):
+                        if key in event:
+                            payload[key] = event[key]
+                yield format_sse(payload, event='bar', event_id=event['id'])
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def source_from_env(fetch):
+    """Build the bar source configured through STREAM_* environment variables"""
+    if os.environ.get('STREAM_SOURCE', 'live') == 'replay':
+        symbol = os.environ.get('STREAM_REPLAY_SYMBOL', 'RELIANCE')
+        return CSVReplaySource(
+            os.path.join(ARCHIVE_DIR, f'{symbol}.csv'),
+            speed=float(os.environ.get('STREAM_REPLAY_SPEED', '1.0')),
+            start=os.environ.get('STREAM_REPLAY_START'),
+            warmup=int(os.environ.get('STREAM_REPLAY_WARMUP', '250')),
+            loop=os.environ.get('STREAM_REPLAY_LOOP', '0') == '1'
+        )
+    return PollingSource(fetch, interval=float(os.environ.get('STREAM_POLL_SECONDS', '300')))
@@ -0,0 +1,92 @@
+"""
+Memory-bounded training data for the global model
+Streams normalized windows from the feature store symbol by symbol and
+shuffles them across symbols through a fixed-size buffer, so peak memory is
+set by buffer_size and chunk_size rather than by how much history there is.
+"""
+
+import numpy as np
+
+
+class WindowStream:
+    """Re-iterable source of shuffled (X, y) batches over many symbols
+
+    Each symbol's windows are split in time: the first (1 - validation_fraction)
+    go to the 'train' stream and the rest to the 'validation' stream. Calling
+    the object returns a fresh generator, as tf.data.Dataset.from_generator
+    expects, and every call is one epoch.
+    """
+
+    def __init__(self, feature_sets, sequence_length, batch_size=64, buffer_size=8192,
+                 chunk_size=256, split='train', validation_fraction=0.2, seed=0):
+        self.feature_sets = feature_sets
+        self.sequence_length = sequence_length
+        self.batch_size = batch_size
+        self.buffer_size = max(buffer_size, 2 * batch_size)
+        self.chunk_size = chunk_size
+        self.split = split
+        self.validation_fraction = validation_fraction
+        self.seed = seed
+        self._epoch = 0
+        self.ranges = {symbol: self._range(features) for symbol, features in feature_sets.items()}
+
+    def _range(self, features):
+        """[start, stop) of the windows this stream uses for one symbol"""
+        total = len(features.windows)
+        split = int(total * (1 - self.validation_fraction))
+        return (0, split) if self.split == 'train' else (split, total)
+
+    def __len__(self):
+        """Number of windows per epoch"""
+        return sum(stop - start for start, stop in self.ranges.values())
+
+    def _chunks(self, rng):
+        """Interleave chunks of all symbols, picking symbols in proportion to what they have left"""
+        pending = {}
+        for symbol, (start, stop) in self.ranges.items():
+            offsets = list(range(start, stop, self.chunk_size))
+            rng.shuffle(offsets)
+            if offsets:
+                pending[symbol] = offsets
+
+        while pending:
+            symbols = list(pending)
+            weights = np.array([len(pending[symbol]) for symbol in symbols], dtype=float)
+            symbol = symbols[rng.choice(len(symbols), p=weights / weights.sum())]
+            offset = pending[symbol].pop()
+            if not pending[symbol]:
+                del pending[symbol]
+            stop = min(offset + self.chunk_size, self.ranges[symbol][1])
+            # Copy only this chunk out of the memory map
+            yield np.array(self.feature_sets[symbol].windows[offset:stop, :self.sequence_length + 1])
+
+    def _batch(self, windows):
+        X = windows[:, :self.sequence_length].reshape(-1, 1, self.sequence_length, 1)
+        y = windows[:, self.sequence_length].reshape(-1, 1)
+        return X, y
+
+    def __call__(self):
+        rng = np.random.default_rng(self.seed + self._epoch)
+        self._epoch += 1
+
+        width = self.sequence_length + 1
+        buffer = np.empty((self.buffer_size + self.chunk_size, width), dtype=np.float32)
+        filled = 0
+
+        for chunk in self._chunks(rng):
+            buffer[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            if filled < self.buffer_size:
+                continue
+
+            # Emit a random half of the buffer and keep the rest for mixing with later chunks
+            order = rng.permutation(filled)
+            emit = (filled // 2) // self.batch_size * self.batch_size
+            for start in range(0, emit, self.batch_size):
+                yield self._batch(buffer[order[start:start + self.batch_size]])
+            buffer[:filled - emit] = buffer[order[emit:]]
+            filled -= emit
+
+        order = rng.permutation(filled)
+        for start in range(0, filled, self.batch_size):
+            yield self._batch(buffer[order[start:start + self.batch_size]])
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Load Test Harness for NIFTY Prediction API
+Drives /api/predict and /api/historical at a configurable concurrency and
+request mix, then reports throughput, latency percentiles and error rates
+as a JSON artifact that can be compared between runs.
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'loadtest_results')
+PERCENTILES = [50, 90, 95, 99]
+
+
+def parse_mix(spec):
+    """Parse a mix like 'predict=3,historical=1' into relative weights"""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight) if weight else 1.0
+    unknown = set(mix) - {'predict', 'historical'}
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def parse_windows(spec):
+    """Parse date windows like '2020-01-01:2020-12-31,2021-01-01:' into (start, end) pairs"""
+    windows = []
+    for part in filter(None, spec.split(',')):
+        start, _, end = part.partition(':')
+        windows.append((start or None, end or None))
+    return windows
+
+
+def build_request(rng, args, mix):
+    """Pick the next request (label, method, path, params, body) from the configured mix"""
+    endpoint = rng.choices(list(mix), weights=list(mix.values()))[0]
+    symbol = rng.choice(args.symbols)
+
+    if endpoint == 'predict':
+        days = rng.choice(args.days)
+        body = {'days': days}
+        if symbol != 'NIFTY':
+            body['symbol'] = symbol
+        return f"predict days={days}", 'POST', '/api/predict', None, body
+
+    params = {}
+    if symbol != 'NIFTY':
+        params['symbol'] = symbol
+    if args.windows:
+        start, end = rng.choice(args.windows)
+        if start:
+            params['start'] = start
+        if end:
+            params['end'] = end
+    return 'historical', 'GET', '/api/historical', params, None
+
+
+def run_worker(worker_id, args, mix, deadline, results, lock):
+    """Issue requests back to back until the deadline or request budget is reached"""
+    rng = random.Random(args.seed + worker_id)
+    session = requests.Session()
+
+    while time.perf_counter() < deadline:
+        with lock:
+            if args.requests and results['issued'] >= args.requests:
+                return
+            results['issued'] += 1
+
+        label, method, path, params, body = build_request(rng, args, mix)
+        started = time.perf_counter()
+        error = None
+        try:
+            response = session.request(method, args.url + path, params=params, json=body,
+                                       timeout=args.timeout)
+            status = response.status_code
+            if status >= 400:
+                error = f"HTTP {status}"
+        except requests.exceptions.RequestException as e:
+            status = None
+            error = type(e).__name__
+        elapsed = time.perf_counter() - started
+
+        with lock:
+            results['samples'].append((label, elapsed, status, error))
+
+
+def summarize(samples, duration):
+    """Aggregate raw samples into throughput, latency and error figures"""
+    if not samples:
+        return {'requests': 0, 'errors': 0, 'error_rate': 0.0, 'throughput_rps': 0.0}
+
+    latencies = np.array([sample[1] for sample in samples]) * 1000
+    errors = [sample[3] for sample in samples if sample[3]]
+    error_kinds = {}
+    for error in errors:
+        error_kinds[error] = error_kinds.get(error, 0) + 1
+
+    summary = {
+        'requests': len(samples),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(samples), 4),
+        'throughput_rps': round(len(samples) / duration, 2),
+        'latency_ms': {
+            'mean': round(float(latencies.mean()), 2),
+            'min': round(float(latencies.min()), 2),
+            'max': round(float(latencies.max()), 2)
+        }
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        summary['latency_ms'][f'p{percentile}'] = round(float(value), 2)
+    if error_kinds:
+        summary['error_kinds'] = error_kinds
+    return summary
+
+
+def install_stub_models(backend):
+    """Give the in-process backend models when none are saved
+
+    Untrained models with the real architecture (kept in memory only, never
+    saved), so predict requests run the same forward passes as with trained
+    ones instead of failing fast with "Model not available".
+    """
+    from sklearn.preprocessing import MinMaxScaler
+
+    def stand_in():
+        model = backend.create_advanced_cnn_lstm_model((backend.sequence_length, 1))
+        # Build the weights with one batch shaped like forecast_batch() inputs
+        model.predict_on_batch(np.zeros((1, 1, backend.sequence_length, 1)))
+        return model
+
+    if not backend.load_model_from_disk():
+        closes = backend.generate_synthetic_data()['Close'].to_numpy().reshape(-1, 1)
+        backend.scaler = MinMaxScaler(feature_range=(0, 1)).fit(closes)
+        backend.model = stand_in()
+        print("⚠️  No saved NIFTY model: using an untrained stand-in (latency is representative, forecasts are not)")
+    if not backend.load_global_model_from_disk():
+        backend.global_model = stand_in()
+        print("⚠️  No saved global model: using an untrained stand-in for non-NIFTY symbols")
+
+
+def start_stub_server(port):
+    """Start the backend in-process on a synthetic data source
+
+    Models, snapshots, features and indices live in a temporary directory
+    (NIFTY_STATE_DIR), so the stub neither serves nor overwrites the real
+    backend's files, including when --train-first trains on synthetic data.
+    """
+    os.environ['NIFTY_DATA_SOURCE'] = 'synthetic'
+    state_dir = tempfile.mkdtemp(prefix='niftypred-loadtest-')
+    os.environ['NIFTY_STATE_DIR'] = state_dir
+    atexit.register(shutil.rmtree, state_dir, True)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+    from werkzeug.serving import make_server
+    import app as backend
+
+    install_stub_models(backend)
+    flask_app = backend.app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', port, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"✅ Stub backend running on http://127.0.0.1:{server.server_port} (state in {state_dir})")
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_report(report):
+    """Print a human readable table of the report"""
+    header = f"{'endpoint':<22}{'reqs':>8}{'rps':>9}{'err%':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for name, stats in rows:
+        latency = stats.get('latency_ms', {})
+        print(f"{name:<22}{stats['requests']:>8}{stats['throughput_rps']:>9.1f}"
+              f"{stats['error_rate'] * 100:>7.1f}%"
+              + ''.join(f"{latency.get(f'p{p}', 0):>9.1f}" for p in PERCENTILES))
+
+
+def print_comparison(report, baseline_path):
+    """Print throughput and latency deltas against an earlier report"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\n📊 Compared with {baseline_path}:")
+    for name, stats in list(report['endpoints'].items()) + [('TOTAL', report['total'])]:
+        old = baseline['total'] if name == 'TOTAL' else baseline['endpoints'].get(name)
+        if not old or not old.get('requests') or not stats.get('requests'):
+            continue
+        rps_delta = (stats['throughput_rps'] / old['throughput_rps'] - 1) * 100 if old['throughput_rps'] else 0
+        p95_delta = (stats['latency_ms']['p95'] / old['latency_ms']['p95'] - 1) * 100 if old['latency_ms']['p95'] else 0
+        print(f"  {name:<22} throughput {rps_delta:+6.1f}%   p95 {p95_delta:+6.1f}%   "
+              f"error rate {old['error_rate'] * 100:.1f}% -> {stats['error_rate'] * 100:.1f}%")
+
+
+def main():
+    """Main function to run a load test"""
+    parser = argparse.ArgumentParser(description='Load test the NIFTY Prediction API')
+    parser.add_argument('--url', default='http://localhost:5000', help='Backend base URL')
+    parser.add_argument('--serve-stub', action='store_true',
+                        help='Start the backend in-process with a synthetic data source instead of using --url')
+    parser.add_argument('--port', type=int, default=0, help='Port for --serve-stub (default: any free port)')
+    parser.add_argument('--train-first', action='store_true',
+                        help='Call /api/train once before the run (with --serve-stub it trains into the temporary state directory)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='Run time in seconds')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests (0 = no limit)')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint before the run')
+    parser.add_argument('--mix', default='predict=1,historical=1', help="Endpoint weights, e.g. 'predict=3,historical=1'")
+    parser.add_argument('--days', default='1,7,30', help='Comma separated prediction horizons to draw from')
+    parser.add_argument('--symbols', default='NIFTY', help='Comma separated symbols to draw from')
+    parser.add_argument('--windows', default='', help="Date windows for /api/historical, e.g. '2020-01-01:2020-12-31,2021-01-01:'")
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the request mix')
+    parser.add_argument('--output', help='Report path (default: loadtest_results/loadtest_<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier report to compare against')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    args.days = [int(day) for day in args.days.split(',')]
+    args.symbols = [symbol.strip() for symbol in args.symbols.split(',')]
+    args.windows = parse_windows(args.windows)
+
+    print("🚀 Starting NIFTY Prediction API load test...")
+    print("=" * 60)
+
+    server = None
+    if args.serve_stub:
+        server, args.url = start_stub_server(args.port)
+    args.url = args.url.rstrip('/')
+
+    try:
+        if args.train_first:
+            print("⏳ Training model before the run...")
+            response = requests.post(args.url + '/api/train', timeout=None)
+            print(f"   /api/train -> HTTP {response.status_code}")
+
+        # Without a model every predict is a fast 400 and the run would measure the error path
+        if 'predict' in mix and mix['predict'] > 0:
+            info = requests.get(args.url + '/api/model-info', timeout=args.timeout).json()
+            if not info.get('model_loaded'):
+                print("❌ The backend has no trained model, so predict requests would only measure errors.")
+                print("   Train one first (--train-first), use --serve-stub, or drop predict from --mix.")
+                return 1
+
+        rng = random.Random(args.seed)
+        for _ in range(args.warmup):
+            for endpoint in mix:
+                _, method, path, params, body = build_request(rng, args, {endpoint: 1})
+                try:
+                    requests.request(method, args.url + path, params=params, json=body, timeout=args.timeout)
+                except requests.exceptions.RequestException:
+                    pass
+
+        print(f"📥 {args.concurrency} clients for {args.duration:.0f}s, mix {mix}")
+        results = {'issued': 0, 'samples': []}
+        lock = threading.Lock()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for worker_id in range(args.concurrency):
+                executor.submit(run_worker, worker_id, args, mix, deadline, results, lock)
+        duration = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    by_endpoint = {}
+    for sample in results['samples']:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'url': args.url,
+            'stub_backend': args.serve_stub,
+            'concurrency': args.concurrency,
+            'duration_s': round(duration, 2),
+            'mix': mix,
+            'days': args.days,
+            'symbols': args.symbols,
+            'windows': args.windows,
+            'seed': args.seed
+        },
+        'total': summarize(results['samples'], duration),
+        'endpoints': {name: summarize(samples, duration) for name, samples in sorted(by_endpoint.items())}
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    print_report(report)
+    if args.compare:
+        print_comparison(report, args.compare)
+    print("=" * 60)
+    print(f"✅ Report saved to {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())